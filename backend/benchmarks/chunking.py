@@ -0,0 +1,96 @@
+"""Throughput benchmark for the fixed-size and semantic chunkers
+
+Usage:
+    python -m benchmarks.chunking --size-kb 512 --repeat 5
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.document_processor import chunk_text, chunk_text_semantic
+
+WORDS = (
+    "the model results data analysis study method research paper network learning "
+    "performance system approach table figure value section training evaluation "
+    "sample error dataset baseline experiment accuracy loss structure"
+).split()
+
+
+def generate_text(size_bytes: int, seed: int = 0) -> str:
+    """
+    Generate a deterministic Markdown-like document with headings, paragraphs and sentences
+    """
+    rng = random.Random(seed)
+    parts = []
+    size = 0
+    section = 0
+    while size < size_bytes:
+        if rng.random() < 0.1:
+            section += 1
+            block = f"{'#' * rng.randint(1, 3)} Section {section}"
+        else:
+            sentences = []
+            for _ in range(rng.randint(2, 8)):
+                words = [rng.choice(WORDS) for _ in range(rng.randint(6, 25))]
+                sentences.append(" ".join(words).capitalize() + rng.choice([".", ".", ".", "?", "!"]))
+            block = " ".join(sentences)
+        parts.append(block)
+        size += len(block) + 2
+    return "\n\n".join(parts)
+
+
+def ends_on_sentence(chunk: str) -> bool:
+    return chunk.rstrip().endswith((".", "?", "!")) or chunk.lstrip().startswith("#")
+
+
+def run(size_kb: int = 512, repeat: int = 5, chunk_size: int = 1000, overlap: int = 200,
+        max_tokens: int = 256, overlap_tokens: int = 32) -> dict:
+    """
+    Time both chunkers on the same generated text and return per-chunker statistics
+    """
+    text = generate_text(size_kb * 1024)
+    size_mb = len(text.encode("utf-8")) / (1024 * 1024)
+
+    chunkers = {
+        "fixed": lambda: chunk_text(text, chunk_size, overlap),
+        "semantic": lambda: [c.text for c in chunk_text_semantic(text, max_tokens, overlap_tokens)],
+    }
+
+    results = {}
+    for name, chunker in chunkers.items():
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            chunks = chunker()
+            timings.append(time.perf_counter() - started)
+        best = min(timings)
+        results[name] = {
+            "seconds": best,
+            "mb_per_second": size_mb / best,
+            "chunks": len(chunks),
+            "mean_chunk_chars": sum(len(c) for c in chunks) / max(len(chunks), 1),
+            "sentence_aligned": sum(ends_on_sentence(c) for c in chunks) / max(len(chunks), 1),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fixed-size vs semantic chunking")
+    parser.add_argument("--size-kb", type=int, default=512, help="size of the generated document")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per chunker (best time is reported)")
+    args = parser.parse_args()
+
+    results = run(size_kb=args.size_kb, repeat=args.repeat)
+    print(f"{'chunker':<10} {'MB/s':>8} {'chunks':>8} {'mean chars':>11} {'sentence-aligned':>17}")
+    for name, r in results.items():
+        print(f"{name:<10} {r['mb_per_second']:>8.2f} {r['chunks']:>8} "
+              f"{r['mean_chunk_chars']:>11.0f} {r['sentence_aligned']:>16.0%}")
+
+
+if __name__ == "__main__":
+    main()
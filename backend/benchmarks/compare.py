@@ -0,0 +1,48 @@
+"""Compare two benchmark result files and flag regressions
+
+Usage:
+    python -m benchmarks.compare benchmarks/results/base.json benchmarks/results/head.json --threshold 0.1
+
+Exits with status 1 if any benchmark's median got slower by more than the threshold.
+"""
+import argparse
+import json
+import sys
+
+
+def compare(base: dict, head: dict, threshold: float):
+    """
+    Yield (name, base median, head median, relative change, regressed) for benchmarks in both files
+    """
+    for name in sorted(set(base["results"]) & set(head["results"])):
+        before = base["results"][name]["median"]
+        after = head["results"][name]["median"]
+        change = (after - before) / before if before > 0 else 0.0
+        yield name, before, after, change, change > threshold
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("base", help="results of the baseline commit")
+    parser.add_argument("head", help="results of the commit under test")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="relative slowdown of the median reported as a regression")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    print(f"base {base['meta']['commit']} -> head {head['meta']['commit']}")
+    regressions = 0
+    for name, before, after, change, regressed in compare(base, head, args.threshold):
+        marker = "REGRESSION" if regressed else ""
+        print(f"{name:<55} {before * 1000:>10.3f} ms -> {after * 1000:>10.3f} ms {change:>+8.1%} {marker}")
+        regressions += regressed
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Shared setup and timing helpers for the backend benchmarks
+
+The app runs in-process behind Starlette's TestClient, against SQLite in a
+temporary directory by default. Set BENCH_DATABASE_URL to benchmark against a
+local Postgres instead.
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCH_USER = {"email": "bench@example.com", "username": "bench", "password": "benchmark-password"}
+
+
+def summarize(timings: List[float]) -> Dict[str, float]:
+    """
+    Reduce raw timings (seconds) to the statistics stored in benchmark results
+    """
+    ordered = sorted(timings)
+    return {
+        "runs": len(ordered),
+        "min": ordered[0],
+        "median": statistics.median(ordered),
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "mean": statistics.fmean(ordered),
+        "ops_per_second": len(ordered) / sum(ordered) if sum(ordered) else 0.0,
+    }
+
+
+def measure(func: Callable[[], object], repeat: int = 20, warmup: int = 2) -> Dict[str, float]:
+    """
+    Call func repeatedly and summarize its wall-clock time
+    """
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return summarize(timings)
+
+
+class AppHarness:
+    """
+    In-process API client with its own database, upload directory and user
+    """
+
+    def __init__(self, database_url: Optional[str] = None):
+        self.workdir = tempfile.mkdtemp(prefix="writingstuff-bench-")
+        database_url = database_url or os.getenv("BENCH_DATABASE_URL") or f"sqlite:///{self.workdir}/bench.db"
+        # Settings are read at import time, so configure the environment first
+        os.environ["DATABASE_URL"] = database_url
+        os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+        # Benchmarks issue far more requests per user than the rate limits allow
+        os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+        # Uploads are stored relative to the working directory
+        os.chdir(self.workdir)
+
+        from fastapi.testclient import TestClient
+
+        import main
+        from models.base import Base, engine
+
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+
+        self.app = main.app
+        self.client = TestClient(main.app)
+        self.token = self._login()
+        self.headers = {"Authorization": f"Bearer {self.token}"}
+
+    def _login(self) -> str:
+        self.client.post("/api/v1/auth/register", json=BENCH_USER)
+        response = self.client.post(
+            "/api/v1/auth/login",
+            data={"username": BENCH_USER["email"], "password": BENCH_USER["password"]},
+        )
+        response.raise_for_status()
+        return response.json()["access_token"]
+
+    def upload(self, filename: str, content: bytes) -> dict:
+        response = self.client.post("/api/v1/documents/", files={"file": (filename, content)}, headers=self.headers)
+        response.raise_for_status()
+        return response.json()
@@ -0,0 +1,306 @@
+"""Asyncio load generator for the API
+
+Drives a weighted mix of login, upload, list and AI traffic either against a
+running server (--url) or in-process against the ASGI app with the LLM
+stubbed out. Reports throughput and p50/p95/p99 latency per endpoint.
+
+Usage:
+    # In-process, closed loop with 32 concurrent clients for 30 seconds
+    python -m benchmarks.loadgen --concurrency 32 --duration 30
+
+    # Against a running server, open loop at 200 requests/s
+    LLM_PROVIDER=stub uvicorn main:app ...
+    python -m benchmarks.loadgen --url http://localhost:8000 --rate 200 --concurrency 256 \\
+        --mix login=1,upload=1,list=10,get=5,rewrite=3,summarize=2,improve=1
+
+The in-process target shares one event loop between the clients and the app,
+so it is meant for comparing changes; use --url to size worker counts and
+connection pools for a real deployment.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.chunking import generate_text
+
+API = "/api/v1"
+SAMPLE_TEXT = generate_text(2000, seed=1)
+
+
+@dataclass
+class VirtualUser:
+    """
+    A registered account used by the load generator
+
+    Each user has its own client, and so its own cookie jar, on the shared
+    connection pool; cookies set for one user never go out with another's
+    requests.
+    """
+    email: str
+    password: str
+    client: httpx.AsyncClient
+    token: Optional[str] = None
+    document_ids: Optional[List[int]] = None
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.token}"}
+
+
+@dataclass
+class Scenario:
+    """A named request type and how to issue it for a user"""
+    name: str
+    run: Callable[[httpx.AsyncClient, VirtualUser, random.Random], Awaitable[httpx.Response]]
+
+
+async def _login(client, user, rng):
+    response = await client.post(f"{API}/auth/login", data={"username": user.email, "password": user.password})
+    if response.status_code == 200:
+        user.token = response.json()["access_token"]
+    return response
+
+
+async def _upload(client, user, rng):
+    size = rng.choice((4, 32, 256)) * 1024
+    content = generate_text(size, seed=rng.randrange(1000)).encode("utf-8")
+    response = await client.post(f"{API}/documents/", files={"file": ("load.md", content)}, headers=user.headers)
+    if response.status_code == 201:
+        user.document_ids.append(response.json()["id"])
+    return response
+
+
+async def _list(client, user, rng):
+    return await client.get(f"{API}/documents/", headers=user.headers)
+
+
+async def _get(client, user, rng):
+    document_id = rng.choice(user.document_ids)
+    return await client.get(f"{API}/documents/{document_id}", headers=user.headers)
+
+
+async def _rewrite(client, user, rng):
+    body = {"text": SAMPLE_TEXT[:rng.randint(200, 2000)], "style": "formal"}
+    return await client.post(f"{API}/ai/rewrite", json=body, headers=user.headers)
+
+
+async def _summarize(client, user, rng):
+    body = {"text": SAMPLE_TEXT, "length": 3, "format": "bullets"}
+    return await client.post(f"{API}/ai/summarize", json=body, headers=user.headers)
+
+
+async def _improve(client, user, rng):
+    return await client.post(f"{API}/ai/improve_text", params={"text": SAMPLE_TEXT[:500]}, headers=user.headers)
+
+
+async def _batch(client, user, rng):
+    items = [{"operation": "rewrite", "text": SAMPLE_TEXT[:rng.randint(100, 400)], "style": "formal"}
+             for _ in range(20)]
+    response = await client.post(f"{API}/ai/batch", json={"items": items}, headers=user.headers)
+    await response.aread()
+    return response
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    scenario.name: scenario for scenario in (
+        Scenario("login", _login),
+        Scenario("upload", _upload),
+        Scenario("list", _list),
+        Scenario("get", _get),
+        Scenario("rewrite", _rewrite),
+        Scenario("summarize", _summarize),
+        Scenario("improve", _improve),
+        Scenario("batch", _batch),
+    )
+}
+
+DEFAULT_MIX = "login=1,upload=1,list=10,get=5,rewrite=3,summarize=2,improve=1"
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario: {name}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+class Recorder:
+    """Collects latencies and errors per scenario"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def record(self, name: str, seconds: float, ok: bool) -> None:
+        self.latencies.setdefault(name, []).append(seconds)
+        if not ok:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def report(self, elapsed: float) -> Dict[str, dict]:
+        report = {}
+        for name, latencies in sorted(self.latencies.items()):
+            ordered = sorted(latencies)
+            report[name] = {
+                "requests": len(ordered),
+                "errors": self.errors.get(name, 0),
+                "throughput": len(ordered) / elapsed,
+                "p50": percentile(ordered, 0.50),
+                "p95": percentile(ordered, 0.95),
+                "p99": percentile(ordered, 0.99),
+                "max": ordered[-1],
+            }
+        return report
+
+
+async def setup_users(transport: httpx.AsyncBaseTransport, base_url: str, count: int) -> List[VirtualUser]:
+    """Register (if needed) and log in the virtual users, each with one document"""
+    users = []
+    run_id = random.randrange(1 << 30)
+    for i in range(count):
+        client = httpx.AsyncClient(transport=transport, base_url=base_url, timeout=60)
+        user = VirtualUser(email=f"load{run_id}_{i}@example.com", password="load-test-password",
+                           client=client, document_ids=[])
+        await client.post(f"{API}/auth/register", json={
+            "email": user.email, "username": f"load{run_id}_{i}", "password": user.password
+        })
+        response = await _login(client, user, None)
+        response.raise_for_status()
+        (await _upload(client, user, random.Random(i))).raise_for_status()
+        users.append(user)
+    return users
+
+
+async def run_load(users: List[VirtualUser], weights: Dict[str, float],
+                   duration: float, concurrency: int, rate: Optional[float], seed: int = 0) -> Dict[str, dict]:
+    """
+    Issue requests for `duration` seconds and return per-scenario statistics
+
+    With `rate` set, requests arrive as a Poisson process (open loop) and at
+    most `concurrency` are in flight; otherwise `concurrency` clients issue
+    requests back to back (closed loop).
+    """
+    rng = random.Random(seed)
+    # Relative weights, in the order of names
+    names, weights = list(weights), list(weights.values())
+    recorder = Recorder()
+    slots = asyncio.Semaphore(concurrency)
+    deadline = time.perf_counter() + duration
+
+    async def one_request():
+        name = rng.choices(names, weights=weights)[0]
+        user = rng.choice(users)
+        started = time.perf_counter()
+        try:
+            response = await SCENARIOS[name].run(user.client, user, rng)
+            ok = response.status_code < 400
+        except Exception:
+            # With the in-process transport, app exceptions surface here too;
+            # count them as errors instead of aborting the run
+            ok = False
+        recorder.record(name, time.perf_counter() - started, ok)
+
+    async def closed_loop_client():
+        while time.perf_counter() < deadline:
+            await one_request()
+
+    async def open_loop_request():
+        try:
+            await one_request()
+        finally:
+            slots.release()
+
+    started = time.perf_counter()
+    if rate:
+        tasks = set()
+        next_arrival = started
+        while next_arrival < deadline:
+            await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+            # Arrivals that find every slot busy wait here, so queueing delay
+            # shows up as lower achieved throughput instead of being hidden
+            await slots.acquire()
+            task = asyncio.create_task(open_loop_request())
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            next_arrival += rng.expovariate(rate)
+        if tasks:
+            await asyncio.wait(tasks)
+    else:
+        await asyncio.gather(*(closed_loop_client() for _ in range(concurrency)))
+
+    return recorder.report(time.perf_counter() - started)
+
+
+def make_transport(url: Optional[str], concurrency: int) -> Tuple[httpx.AsyncBaseTransport, str]:
+    """Get the transport (connection pool) shared by all virtual users, and the base URL"""
+    if url:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        return httpx.AsyncHTTPTransport(limits=limits), url
+
+    # In-process target: use the local LLM stub instead of a real model
+    os.environ["LLM_PROVIDER"] = "stub"
+    from benchmarks.harness import AppHarness
+
+    harness = AppHarness()
+    return httpx.ASGITransport(app=harness.app), "http://loadgen"
+
+
+async def main_async(args) -> Dict[str, dict]:
+    weights = parse_mix(args.mix)
+    transport, base_url = make_transport(args.url, args.concurrency)
+    # The user clients share the transport, so it is closed once here
+    try:
+        users = await setup_users(transport, base_url, args.users)
+        return await run_load(users, weights, args.duration, args.concurrency, args.rate, args.seed)
+    finally:
+        await transport.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate mixed load against the API")
+    parser.add_argument("--url", help="base URL of a running server (defaults to the in-process app)")
+    parser.add_argument("--duration", type=float, default=30, help="test duration in seconds")
+    parser.add_argument("--concurrency", type=int, default=16, help="maximum requests in flight")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="arrival rate in requests/s (open loop); omit for a closed loop")
+    parser.add_argument("--users", type=int, default=8, help="number of virtual users")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="scenario weights, e.g. list=10,rewrite=2")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the request mix")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+
+    print(f"{'endpoint':<12} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, r in report.items():
+        print(f"{name:<12} {r['requests']:>9} {r['errors']:>7} {r['throughput']:>8.1f} "
+              f"{r['p50'] * 1000:>9.1f} {r['p95'] * 1000:>9.1f} {r['p99'] * 1000:>9.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
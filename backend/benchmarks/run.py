@@ -0,0 +1,231 @@
+"""Run the backend benchmark suite and store the results as JSON
+
+Usage:
+    python -m benchmarks.run                          # all suites
+    python -m benchmarks.run --suite chunking --suite ingestion
+    python -m benchmarks.run --output results/base.json
+
+Results are written to benchmarks/results/<git commit>.json by default; use
+benchmarks.compare to diff two result files.
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+from typing import Callable, Dict, List
+
+# Add the backend directory to the Python path
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.chunking import generate_text
+from benchmarks.harness import AppHarness, measure
+
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+
+
+def make_pdf(pages: int, seed: int = 0) -> bytes:
+    """
+    Generate a text-only PDF with the given number of pages
+    """
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    text = generate_text(pages * 3000, seed=seed).split("\n\n")
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=letter)
+    for page in range(pages):
+        y = 750
+        for paragraph in text[page::pages]:
+            for start in range(0, len(paragraph), 95):
+                pdf.drawString(40, y, paragraph[start:start + 95])
+                y -= 12
+                if y < 40:
+                    break
+            if y < 40:
+                break
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def bench_chunking(harness: AppHarness) -> Dict[str, dict]:
+    from utils.document_processor import chunk_text, chunk_text_semantic
+
+    results = {}
+    for size_kb in (64, 512):
+        text = generate_text(size_kb * 1024)
+        results[f"chunk_text.{size_kb}kb"] = measure(lambda: chunk_text(text), repeat=10)
+        results[f"chunk_text_semantic.{size_kb}kb"] = measure(lambda: chunk_text_semantic(text), repeat=10)
+    return results
+
+
+def bench_pdf_extraction(harness: AppHarness) -> Dict[str, dict]:
+    from utils.document_processor import extract_text_from_pdf
+
+    results = {}
+    for pages in (1, 10, 50):
+        pdf = make_pdf(pages)
+        results[f"extract_text_from_pdf.{pages}p"] = measure(lambda: extract_text_from_pdf(pdf), repeat=5)
+    return results
+
+
+def bench_ingestion(harness: AppHarness) -> Dict[str, dict]:
+    results = {}
+    for size_kb in (10, 100, 1000):
+        content = generate_text(size_kb * 1024).encode("utf-8")
+        stats = measure(lambda: harness.upload(f"bench_{size_kb}kb.txt", content), repeat=5, warmup=1)
+        stats["mb_per_second"] = len(content) / (1024 * 1024) / stats["median"]
+        results[f"upload.txt.{size_kb}kb"] = stats
+    for pages in (10, 50):
+        content = make_pdf(pages)
+        stats = measure(lambda: harness.upload(f"bench_{pages}p.pdf", content), repeat=5, warmup=1)
+        stats["pages_per_second"] = pages / stats["median"]
+        results[f"upload.pdf.{pages}p"] = stats
+    return results
+
+
+def bench_auth(harness: AppHarness) -> Dict[str, dict]:
+    client, headers = harness.client, harness.headers
+    unauthenticated = measure(lambda: client.get("/health"), repeat=200, warmup=10)
+    authenticated = measure(lambda: client.get("/api/v1/auth/me", headers=headers), repeat=200, warmup=10)
+    return {
+        "unauthenticated": unauthenticated,
+        "authenticated": authenticated,
+        "overhead": {"median": authenticated["median"] - unauthenticated["median"]},
+    }
+
+
+def bench_search(harness: AppHarness) -> Dict[str, dict]:
+    document = harness.upload("bench_search.txt", generate_text(256 * 1024).encode("utf-8"))
+    client, headers = harness.client, harness.headers
+    url = f"/api/v1/documents/{document['id']}/search"
+    return {
+        "query.256kb": measure(lambda: client.get(url, params={"query": "training accuracy"}, headers=headers),
+                                repeat=50, warmup=5),
+    }
+
+
+def bench_serialization(harness: AppHarness) -> Dict[str, dict]:
+    import gzip
+
+    import brotli
+    from fastapi.responses import JSONResponse, ORJSONResponse
+    from pydantic import TypeAdapter
+
+    from routers.documents import SearchResult
+    from utils.document_processor import uuid7
+    from schemas.document import Document as DocumentSchema
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    text = generate_text(1000 * 1024)
+    documents = [
+        DocumentSchema(
+            id=i, title=f"Document {i}", description=text[i * 500:i * 500 + 500], file_type="pdf",
+            file_path=f"uploads/document_{i}.pdf", file_size=1024 * i, chunk_count=i, user_id=1,
+            created_at=now, updated_at=now,
+        )
+        for i in range(100)
+    ]
+    search_results = [
+        SearchResult(chunk_id=uuid7(), text=text[i * 1000:i * 1000 + 1000], page_number=i // 10,
+                     relevance_score=1 / (i + 1))
+        for i in range(100)
+    ]
+
+    results = {}
+    for name, schema, payload in (("documents.100", DocumentSchema, documents),
+                                  ("search_results.100", SearchResult, search_results)):
+        # Mirrors FastAPI: response_model output is dumped by pydantic, then
+        # rendered by the response class (JSONResponse before, ORJSONResponse now)
+        adapter = TypeAdapter(List[schema])
+        results[f"{name}.json"] = measure(lambda: JSONResponse(adapter.dump_python(payload, mode="json")), repeat=50)
+        results[f"{name}.orjson"] = measure(lambda: ORJSONResponse(adapter.dump_python(payload, mode="json")),
+                                            repeat=50)
+
+        body = ORJSONResponse(adapter.dump_python(payload, mode="json")).body
+        for encoding, compress in (("gzip", lambda: gzip.compress(body, 6)),
+                                   ("br", lambda: brotli.compress(body, quality=4))):
+            stats = measure(compress, repeat=50)
+            stats["ratio"] = len(body) / len(compress())
+            results[f"{name}.{encoding}"] = stats
+    return results
+
+
+def bench_chunk_ids(harness: AppHarness) -> Dict[str, dict]:
+    from benchmarks import chunk_ids
+
+    return chunk_ids.run(rows=50000, database_url=os.environ["DATABASE_URL"])
+
+
+def bench_startup(harness: AppHarness) -> Dict[str, dict]:
+    from benchmarks import startup
+
+    result = startup.run(runs=5)
+    return {"cold_start": {key: value for key, value in result.items() if key != "eagerly_loaded"}}
+
+
+SUITES: Dict[str, Callable[[AppHarness], Dict[str, dict]]] = {
+    "chunking": bench_chunking,
+    "pdf_extraction": bench_pdf_extraction,
+    "ingestion": bench_ingestion,
+    "auth": bench_auth,
+    "search": bench_search,
+    "serialization": bench_serialization,
+    "chunk_ids": bench_chunk_ids,
+    "startup": bench_startup,
+}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the backend benchmark suite")
+    parser.add_argument("--suite", action="append", choices=sorted(SUITES),
+                        help="suite to run (repeatable, defaults to all)")
+    parser.add_argument("--output", help="result file (defaults to benchmarks/results/<commit>.json)")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    output = os.path.abspath(args.output or os.path.join(RESULTS_DIR, f"{commit}.json"))
+
+    harness = AppHarness()
+    results = {}
+    for name in args.suite or list(SUITES):
+        print(f"Running {name}...", file=sys.stderr)
+        for key, stats in SUITES[name](harness).items():
+            results[f"{name}.{key}"] = stats
+
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": os.environ["DATABASE_URL"].split("://", 1)[0],
+        },
+        "results": results,
+    }
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+    for key, stats in results.items():
+        print(f"{key:<55} median {stats['median'] * 1000:>10.3f} ms")
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Cold-start benchmark for the API
+
+Imports `main` in fresh interpreter processes, the same work a new worker
+does before it can serve its first request, and fails if the median is
+above the target.
+
+Usage:
+    python -m benchmarks.startup --runs 10 --target-ms 2000
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must not be loaded until they are needed
+LAZY_MODULES = ("pypdf",)
+
+PROBE = (
+    "import sys, time; started = time.perf_counter(); import main; "
+    "print(time.perf_counter() - started); "
+    f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+)
+
+
+def run(runs: int = 10, database_url: str = "sqlite:///:memory:") -> Dict[str, float]:
+    """
+    Measure process start-to-app-ready time and the import time of `main`
+    """
+    env = dict(os.environ, DATABASE_URL=database_url)
+    process_timings, import_timings = [], []
+    eagerly_loaded = set()
+    for _ in range(runs):
+        started = time.perf_counter()
+        output = subprocess.check_output([sys.executable, "-c", PROBE], cwd=BACKEND_DIR, env=env)
+        process_timings.append(time.perf_counter() - started)
+        import_time, loaded = output.decode().split("\n")[:2]
+        import_timings.append(float(import_time))
+        eagerly_loaded.update(m for m in loaded.split(",") if m)
+
+    return {
+        "runs": runs,
+        "median": statistics.median(process_timings),
+        "max": max(process_timings),
+        "import_median": statistics.median(import_timings),
+        "eagerly_loaded": sorted(eagerly_loaded),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold start time of the API")
+    parser.add_argument("--runs", type=int, default=10, help="number of fresh processes to start")
+    parser.add_argument("--target-ms", type=float, default=2000, help="maximum acceptable median start time")
+    args = parser.parse_args()
+
+    result = run(args.runs)
+    print(f"median {result['median'] * 1000:.0f} ms (import main {result['import_median'] * 1000:.0f} ms), "
+          f"max {result['max'] * 1000:.0f} ms, target {args.target_ms:.0f} ms")
+
+    failed = False
+    if result["eagerly_loaded"]:
+        print(f"Modules loaded at startup that should be lazy: {', '.join(result['eagerly_loaded'])}")
+        failed = True
+    if result["median"] * 1000 > args.target_ms:
+        print("Startup time is above target")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
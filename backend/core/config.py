@@ -18,9 +18,58 @@ class Settings(BaseSettings):
     # Database settings
     DATABASE_URL: str = os.getenv("DATABASE_URL", "postgresql://postgres:postgres@db:5432/writingstuff")
     
+    # Read replicas for read-only routes (comma-separated URLs; empty = primary only)
+    DATABASE_REPLICA_URLS: str = os.getenv("DATABASE_REPLICA_URLS", "")
+    REPLICA_HEALTH_CHECK_SECONDS: float = float(os.getenv("REPLICA_HEALTH_CHECK_SECONDS", "10"))
+    REPLICA_MAX_LAG_SECONDS: float = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))  # Postgres replicas only
+    REPLICA_STICKY_SECONDS: int = int(os.getenv("REPLICA_STICKY_SECONDS", "30"))  # Reads on the primary after a client writes
+    REPLICA_CONNECT_TIMEOUT_SECONDS: int = int(os.getenv("REPLICA_CONNECT_TIMEOUT_SECONDS", "2"))
+    
+    # Document processing settings
+    CHUNKING_STRATEGY: str = os.getenv("CHUNKING_STRATEGY", "fixed")  # fixed, semantic
+    CHUNK_MAX_TOKENS: int = int(os.getenv("CHUNK_MAX_TOKENS", "256"))
+    CHUNK_OVERLAP_TOKENS: int = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+    
+    # Document deletion: documents are hidden at once and cleaned up in the background
+    CLEANUP_CHUNK_BATCH_SIZE: int = int(os.getenv("CLEANUP_CHUNK_BATCH_SIZE", "1000"))  # Chunk rows per transaction
+    
     # OpenAI settings
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
     
+    # LLM provider: "openai", or "stub" for a local fake with simulated latency (load tests)
+    LLM_PROVIDER: str = os.getenv("LLM_PROVIDER", "openai")
+    LLM_STUB_LATENCY_MS: int = int(os.getenv("LLM_STUB_LATENCY_MS", "300"))
+    
+    # Incremental writing assistant: per-worker cache of improved paragraphs
+    IMPROVE_CACHE_TTL_SECONDS: int = int(os.getenv("IMPROVE_CACHE_TTL_SECONDS", "3600"))
+    IMPROVE_CACHE_MAX_ENTRIES: int = int(os.getenv("IMPROVE_CACHE_MAX_ENTRIES", "10000"))
+    IMPROVE_MAX_CONCURRENCY: int = int(os.getenv("IMPROVE_MAX_CONCURRENCY", "4"))  # Paragraphs in flight per request
+    IMPROVE_MAX_PARAGRAPHS: int = int(os.getenv("IMPROVE_MAX_PARAGRAPHS", "100"))
+    
+    # Bulk AI operations (/ai/batch)
+    AI_BATCH_MAX_ITEMS: int = int(os.getenv("AI_BATCH_MAX_ITEMS", "100"))
+    AI_BATCH_MAX_CONCURRENCY: int = int(os.getenv("AI_BATCH_MAX_CONCURRENCY", "8"))  # Items in flight per request
+    
+    # Embedding settings: chunks are embedded at upload/reindex time when enabled
+    EMBEDDINGS_ENABLED: bool = os.getenv("EMBEDDINGS_ENABLED", "false").lower() == "true"
+    EMBEDDING_PROVIDER: str = os.getenv("EMBEDDING_PROVIDER", "openai")  # openai, stub
+    EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+    EMBEDDING_DIMENSIONS: int = int(os.getenv("EMBEDDING_DIMENSIONS", "1536"))
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))  # Texts per embedding request
+    EMBEDDING_MAX_CONCURRENCY: int = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))  # Requests in flight per pipeline
+    
+    # Search and question answering settings
+    SEARCH_BACKEND: str = os.getenv("SEARCH_BACKEND", "keyword")  # keyword, embedding, postgres
+    ASK_TOP_K: int = int(os.getenv("ASK_TOP_K", "8"))  # Chunks retrieved per question
+    ASK_CONTEXT_MAX_TOKENS: int = int(os.getenv("ASK_CONTEXT_MAX_TOKENS", "3000"))
+    ASK_CACHE_TTL_SECONDS: int = int(os.getenv("ASK_CACHE_TTL_SECONDS", "900"))
+    ASK_CACHE_MAX_ENTRIES: int = int(os.getenv("ASK_CACHE_MAX_ENTRIES", "1000"))
+    
+    # Per-user embedding search shards: files on local disk, memory-mapped on first use
+    SEARCH_SHARDS_ENABLED: bool = os.getenv("SEARCH_SHARDS_ENABLED", "true").lower() == "true"
+    SEARCH_SHARD_DIR: str = os.getenv("SEARCH_SHARD_DIR", "search_shards")
+    SEARCH_SHARD_MEMORY_MB: int = int(os.getenv("SEARCH_SHARD_MEMORY_MB", "512"))  # Mapped shards per worker
+    
     # Pinecone settings
     PINECONE_API_KEY: str = os.getenv("PINECONE_API_KEY", "")
     PINECONE_ENVIRONMENT: str = os.getenv("PINECONE_ENVIRONMENT", "us-west-2")
@@ -32,6 +81,33 @@ class Settings(BaseSettings):
     AWS_REGION: str = os.getenv("AWS_REGION", "us-east-1")
     S3_BUCKET_NAME: str = os.getenv("S3_BUCKET_NAME", "writingstuff-uploads")
     
+    # Rate limiting settings: "<requests>/<seconds>" per user and route
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_STORE: str = os.getenv("RATE_LIMIT_STORE", "memory")  # memory, database
+    RATE_LIMIT_AI: str = os.getenv("RATE_LIMIT_AI", "30/60")
+    RATE_LIMIT_UPLOAD: str = os.getenv("RATE_LIMIT_UPLOAD", "20/60")
+    RATE_LIMIT_AI_BATCH: str = os.getenv("RATE_LIMIT_AI_BATCH", "300/60")  # Batch items and improved paragraphs
+    RATE_LIMIT_EXPORT: str = os.getenv("RATE_LIMIT_EXPORT", "5/60")
+    
+    # Response compression settings (gzip, or brotli when the client accepts it)
+    COMPRESSION_MINIMUM_SIZE: int = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))  # Bytes
+    COMPRESSION_GZIP_LEVEL: int = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+    COMPRESSION_BROTLI_QUALITY: int = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+    
+    # Profiling settings (admins can always request a profile with the X-Profile header)
+    PROFILING_SAMPLE_RATE: float = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+    PROFILING_INTERVAL_MS: float = float(os.getenv("PROFILING_INTERVAL_MS", "5"))
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "profiles")
+    PROFILE_MAX_FILES: int = int(os.getenv("PROFILE_MAX_FILES", "200"))
+    
+    # Production server settings (used by gunicorn.conf.py)
+    SERVER_BIND: str = os.getenv("SERVER_BIND", "0.0.0.0:8000")
+    WEB_CONCURRENCY: int = int(os.getenv("WEB_CONCURRENCY", "0"))  # 0 = one worker per available core
+    WORKER_MAX_REQUESTS: int = int(os.getenv("WORKER_MAX_REQUESTS", "1000"))  # Recycle workers to bound memory growth
+    WORKER_MAX_REQUESTS_JITTER: int = int(os.getenv("WORKER_MAX_REQUESTS_JITTER", "100"))
+    WORKER_TIMEOUT: int = int(os.getenv("WORKER_TIMEOUT", "120"))
+    GRACEFUL_TIMEOUT: int = int(os.getenv("GRACEFUL_TIMEOUT", "30"))  # Time to drain in-flight requests on shutdown
+    
     # CORS settings
     BACKEND_CORS_ORIGINS: list = ["http://localhost:3000", "http://localhost:8000"]
 
@@ -0,0 +1,188 @@
+"""Prometheus metrics for the API, the ingestion pipeline and AI calls
+
+When the app runs under gunicorn, PROMETHEUS_MULTIPROC_DIR is set by
+gunicorn.conf.py and /metrics aggregates the values of all workers.
+"""
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+from sqlalchemy import event
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Request metrics
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ["method", "route", "status"],
+)
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Number of database queries executed per request",
+    ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 500, 1000),
+)
+
+# Ingestion metrics
+INGESTION_STAGE_LATENCY = Histogram(
+    "ingestion_stage_duration_seconds",
+    "Time spent in each stage of document ingestion",
+    ["stage"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+INGESTION_CHUNKS = Counter(
+    "ingestion_chunks_total",
+    "Number of chunks stored by document ingestion",
+)
+
+# LLM metrics
+LLM_LATENCY = Histogram(
+    "llm_request_duration_seconds",
+    "Latency of calls to the language model",
+    ["operation"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120),
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "Tokens sent to and received from the language model",
+    ["operation", "kind"],
+)
+IMPROVE_PARAGRAPHS = Counter(
+    "improve_paragraphs_total",
+    "Paragraphs handled by incremental text improvement",
+    ["outcome"],
+)
+
+# Embedding metrics
+EMBEDDING_CACHE_LOOKUPS = Counter(
+    "embedding_cache_lookups_total",
+    "Chunk texts looked up in the embedding cache",
+    ["outcome"],
+)
+EMBEDDING_BATCH_LATENCY = Histogram(
+    "embedding_batch_duration_seconds",
+    "Latency of one batched embedding request",
+    ["provider"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+# Search shard metrics
+SEARCH_SHARD_EVENTS = Counter(
+    "search_shard_events_total",
+    "Per-user search shard cache events (hit, load, build, evict)",
+    ["event"],
+)
+
+# Rate limiting metrics
+RATE_LIMIT_DECISIONS = Counter(
+    "rate_limit_decisions_total",
+    "Requests allowed or rejected by the rate limiter",
+    ["route", "outcome"],
+)
+
+# Number of DB queries run by the current request (a one-element list, so
+# increments made in threadpool copies of the context are still visible)
+_db_query_count: ContextVar[Optional[list]] = ContextVar("db_query_count", default=None)
+
+
+@contextmanager
+def track_stage(stage: str):
+    """
+    Time a stage of document ingestion (e.g. "extract", "chunk", "store_chunks")
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        INGESTION_STAGE_LATENCY.labels(stage).observe(time.perf_counter() - started)
+
+
+def record_llm_call(operation: str, seconds: float, prompt_tokens: int, completion_tokens: int) -> None:
+    """
+    Record the latency and token usage of a language model call
+    """
+    LLM_LATENCY.labels(operation).observe(seconds)
+    LLM_TOKENS.labels(operation, "prompt").inc(prompt_tokens)
+    LLM_TOKENS.labels(operation, "completion").inc(completion_tokens)
+
+
+def instrument_engine(engine) -> None:
+    """
+    Count queries executed on an engine against the request that issued them
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count_query(conn, cursor, statement, parameters, context, executemany):
+        counter = _db_query_count.get()
+        if counter is not None:
+            counter[0] += 1
+
+
+def metrics_response_body() -> bytes:
+    """
+    Render all metrics in the Prometheus text format
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest()
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency and DB query count per route
+
+    Requests are labelled by route template (e.g. /api/v1/documents/{document_id})
+    rather than raw path, which keeps label cardinality bounded.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._route_paths: Dict[object, str] = {}
+
+    def _route_label(self, scope: Scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        path = self._route_paths.get(endpoint)
+        if path is None:
+            # The router records the matched endpoint in the scope; map it back
+            # to its path template once and remember it
+            for route in scope["app"].routes:
+                if getattr(route, "endpoint", None) is endpoint:
+                    path = route.path
+                    break
+            else:
+                path = "unmatched"
+            self._route_paths[endpoint] = path
+        return path
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        counter = [0]
+        token = _db_query_count.set(counter)
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _db_query_count.reset(token)
+            method = scope["method"]
+            route = self._route_label(scope)
+            REQUEST_LATENCY.labels(method, route, str(status_code)).observe(elapsed)
+            REQUEST_DB_QUERIES.labels(method, route).observe(counter[0])
+
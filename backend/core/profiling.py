@@ -0,0 +1,193 @@
+"""Opt-in sampling profiler for individual requests
+
+A request is profiled when an admin sends the `X-Profile: 1` header, or when
+it is picked by PROFILING_SAMPLE_RATE. While the request runs, a background
+thread samples the stack of the thread serving it and the folded stacks are
+written to PROFILE_DIR in the collapsed format read by flamegraph.pl,
+speedscope and inferno. The profile ID is returned in the `X-Profile-Id`
+response header and the file can be downloaded from /profiles/{profile_id}.
+
+The sampler only sees the event-loop thread. Profiles therefore include
+frames from other requests running concurrently on the loop, and miss work the
+request hands off to the threadpool (sync endpoints and dependencies,
+run_in_threadpool calls).
+
+When a request isn't profiled the middleware only checks one header (and
+draws one random number if sampling is enabled). The admin check for the
+header runs in the threadpool, since it decodes the token and queries the
+database.
+"""
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import List, Optional
+
+from jose import JWTError, jwt
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.config import settings
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+PROFILE_SUFFIX = ".folded"
+_PROFILE_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+class StackSampler:
+    """
+    Samples the stack of one thread at a fixed interval and folds identical stacks
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def profile_path(profile_id: str) -> Optional[str]:
+    """
+    Get the file path of a stored profile, or None if the ID is malformed
+    """
+    if not _PROFILE_ID.match(profile_id):
+        return None
+    return os.path.join(settings.PROFILE_DIR, profile_id + PROFILE_SUFFIX)
+
+
+def list_profiles() -> List[dict]:
+    """
+    List stored profiles, newest first
+    """
+    if not os.path.isdir(settings.PROFILE_DIR):
+        return []
+    profiles = []
+    for entry in os.scandir(settings.PROFILE_DIR):
+        if entry.name.endswith(PROFILE_SUFFIX):
+            stat = entry.stat()
+            profiles.append({
+                "profile_id": entry.name[:-len(PROFILE_SUFFIX)],
+                "size": stat.st_size,
+                "created_at": stat.st_mtime,
+            })
+    profiles.sort(key=lambda p: p["created_at"], reverse=True)
+    return profiles
+
+
+def _save_profile(profile_id: str, method: str, path: str, elapsed: float, sampler: StackSampler) -> None:
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    with open(profile_path(profile_id), "w") as f:
+        f.write(sampler.folded())
+    logger.info(f"Saved profile {profile_id} for {method} {path} ({elapsed * 1000:.1f}ms)")
+
+    # Keep only the newest profiles
+    for stale in list_profiles()[settings.PROFILE_MAX_FILES:]:
+        try:
+            os.remove(profile_path(stale["profile_id"]))
+        except OSError:
+            pass
+
+
+def _is_superuser(authorization: bytes) -> bool:
+    """
+    Check whether a bearer token belongs to an active superuser
+    """
+    from models.base import SessionLocal
+    from models.user import User
+
+    scheme, _, token = authorization.decode("latin-1").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        user_id = int(payload.get("sub"))
+    except (JWTError, TypeError, ValueError):
+        return False
+
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.id == user_id).first()
+        return bool(user and user.is_active and user.is_superuser)
+    finally:
+        db.close()
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that profiles requests on demand (admins) or by sampling rate
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def _should_profile(self, scope: Scope) -> bool:
+        requested = False
+        authorization = None
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                requested = value in (b"1", b"true")
+            elif name == b"authorization":
+                authorization = value
+        if requested:
+            if authorization and await run_in_threadpool(_is_superuser, authorization):
+                return True
+            logger.warning("Ignoring X-Profile header from a non-admin request")
+        sample_rate = settings.PROFILING_SAMPLE_RATE
+        return sample_rate > 0 and random.random() < sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not await self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(PROFILE_ID_HEADER, profile_id.encode())]
+            await send(message)
+
+        # Async endpoints (and the sync work they do inline) run on this thread
+        sampler = StackSampler(threading.get_ident(), settings.PROFILING_INTERVAL_MS / 1000)
+        sampler.start()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            sampler.stop()
+            try:
+                _save_profile(profile_id, scope["method"], scope["path"], elapsed, sampler)
+            except OSError as e:
+                logger.error(f"Error saving profile {profile_id}: {str(e)}")
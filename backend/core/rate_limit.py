@@ -0,0 +1,212 @@
+"""Per-user, per-route rate limiting with token buckets
+
+Each (route, user) pair gets a bucket that holds up to `capacity` tokens and
+refills at `capacity / period` tokens per second; a request takes one token.
+Bucket state lives in a pluggable store: in-process memory (the default,
+per worker) or a shared database table (consistent across workers).
+Checking a request is O(1) in both stores. The database store deletes buckets
+that have been idle long enough to be full again, so the table only holds
+recently active users.
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Tuple
+
+from fastapi import Depends, HTTPException, Request, status
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from core.config import settings
+from core.metrics import RATE_LIMIT_DECISIONS
+from models.user import User
+from routers.auth import get_current_user
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+def parse_rate(rate: str) -> Tuple[float, float]:
+    """
+    Parse a "<requests>/<seconds>" rate into (capacity, refill rate in tokens per second)
+    """
+    requests, _, seconds = rate.partition("/")
+    capacity = float(requests)
+    period = float(seconds or 1)
+    if capacity <= 0 or period <= 0:
+        raise ValueError(f"Invalid rate limit: {rate}")
+    return capacity, capacity / period
+
+
+def _refill(tokens: float, updated_at: float, now: float, capacity: float, refill_rate: float) -> float:
+    return min(capacity, tokens + (now - updated_at) * refill_rate)
+
+
+class InMemoryBucketStore:
+    """
+    Token buckets held in this process
+
+    At most `max_keys` buckets are kept; the least recently used one is
+    dropped first, which only ever resets an idle bucket to full.
+    """
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key: str, capacity: float, refill_rate: float, cost: float = 1) -> Tuple[bool, float]:
+        """
+        Take `cost` tokens from a bucket
+
+        Returns:
+            Tuple[bool, float]: Whether the request is allowed, and the seconds to
+            wait before retrying if it isn't
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = _refill(tokens, updated_at, now, capacity, refill_rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (cost - tokens) / refill_rate
+
+
+class DatabaseBucketStore:
+    """
+    Token buckets stored in the rate_limit_buckets table, shared by all workers
+
+    A bucket left alone for its limit's period is full again, which is the same
+    as having no row. Every `prune_interval` seconds each worker deletes rows
+    idle for longer than the longest period it has seen.
+    """
+
+    def __init__(self, prune_interval: float = 300):
+        self.prune_interval = prune_interval
+        self._max_period = 0.0
+        self._pruned_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, key: str, capacity: float, refill_rate: float, cost: float = 1) -> Tuple[bool, float]:
+        from models.base import SessionLocal
+        from models.rate_limit import RateLimitBucket
+
+        db = SessionLocal()
+        try:
+            self._maybe_prune(db, capacity / refill_rate)
+            for _ in range(2):
+                now = time.time()
+                # Lock the row so concurrent requests from other workers queue up
+                bucket = db.query(RateLimitBucket).filter(RateLimitBucket.key == key).with_for_update().first()
+                if bucket is None:
+                    bucket = RateLimitBucket(key=key, tokens=capacity, updated_at=now)
+                    db.add(bucket)
+                tokens = _refill(bucket.tokens, bucket.updated_at, now, capacity, refill_rate)
+                allowed = tokens >= cost
+                if allowed:
+                    tokens -= cost
+                bucket.tokens = tokens
+                bucket.updated_at = now
+                try:
+                    db.commit()
+                except IntegrityError:
+                    # Another worker created the bucket first; retry against its row
+                    db.rollback()
+                    continue
+                return allowed, 0.0 if allowed else (cost - tokens) / refill_rate
+            raise RuntimeError(f"Could not update rate limit bucket {key}")
+        finally:
+            db.close()
+
+    def _maybe_prune(self, db, period: float) -> None:
+        from models.rate_limit import RateLimitBucket
+
+        with self._lock:
+            self._max_period = max(self._max_period, period)
+            if time.monotonic() - self._pruned_at < self.prune_interval:
+                return
+            self._pruned_at = time.monotonic()
+            max_period = self._max_period
+        try:
+            # Rows idle for a whole period are full; limits this worker hasn't
+            # used yet may have longer periods, hence the interval on top
+            cutoff = time.time() - max_period - self.prune_interval
+            deleted = db.query(RateLimitBucket).filter(RateLimitBucket.updated_at < cutoff).delete(
+                synchronize_session=False
+            )
+            db.commit()
+            if deleted:
+                logger.info(f"Pruned {deleted} idle rate limit buckets")
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"Error pruning rate limit buckets: {str(e)}")
+
+
+_store = None
+
+
+def get_store():
+    """
+    Get the bucket store configured by RATE_LIMIT_STORE
+    """
+    global _store
+    if _store is None:
+        if settings.RATE_LIMIT_STORE == "database":
+            _store = DatabaseBucketStore()
+        elif settings.RATE_LIMIT_STORE == "memory":
+            _store = InMemoryBucketStore()
+        else:
+            raise ValueError(f"Unknown rate limit store: {settings.RATE_LIMIT_STORE}")
+    return _store
+
+
+class RateLimit:
+    """
+    FastAPI dependency enforcing a token bucket per authenticated user and route
+
+    Usage:
+        router = APIRouter(dependencies=[Depends(RateLimit("ai", settings.RATE_LIMIT_AI))])
+    """
+
+    def __init__(self, name: str, rate: str):
+        self.name = name
+        self.capacity, self.refill_rate = parse_rate(rate)
+
+    def __call__(self, request: Request, current_user: User = Depends(get_current_user)) -> None:
+        # A plain def, so FastAPI runs it (and the database store) in the threadpool
+        endpoint = request.scope.get("endpoint")
+        route = f"{self.name}.{endpoint.__name__}" if endpoint else self.name
+        self.enforce(route, current_user.id)
+
+    def enforce(self, route: str, user_id: int, cost: float = 1) -> None:
+        """
+        Take `cost` tokens from a user's bucket for a route, raising 429 if there aren't enough
+
+        Endpoints that do several units of work per request (e.g. batches) call
+        this directly with the number of units, from the threadpool since the
+        database store blocks.
+        """
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        if cost > self.capacity:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Request exceeds the rate limit of {self.capacity:g} per period"
+            )
+
+        allowed, retry_after = get_store().consume(f"{route}:{user_id}", self.capacity, self.refill_rate, cost)
+
+        if not allowed:
+            RATE_LIMIT_DECISIONS.labels(route, "limited").inc()
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Rate limit exceeded",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+        RATE_LIMIT_DECISIONS.labels(route, "allowed").inc()
@@ -0,0 +1,62 @@
+"""Gunicorn configuration for running the API in production
+
+Usage:
+    gunicorn -c gunicorn.conf.py main:app
+
+Runs one Uvicorn worker per available core (or WEB_CONCURRENCY), imports the
+app once in the master before forking, drains in-flight requests for up to
+GRACEFUL_TIMEOUT seconds on shutdown and restarts each worker after about
+WORKER_MAX_REQUESTS requests to bound memory growth from PDF parsing.
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+# Add the current directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Metrics from all workers are aggregated through files in this directory.
+# It has to be set before prometheus_client is imported by the app.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "writingstuff-metrics"))
+shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+from core.config import settings
+
+
+def available_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+bind = settings.SERVER_BIND
+worker_class = "uvicorn.workers.UvicornWorker"
+# Workers are async, so one per core keeps CPU-bound work (PDF parsing,
+# chunking) from oversubscribing the machine
+workers = settings.WEB_CONCURRENCY or available_cores()
+preload_app = True
+max_requests = settings.WORKER_MAX_REQUESTS
+max_requests_jitter = settings.WORKER_MAX_REQUESTS_JITTER
+timeout = settings.WORKER_TIMEOUT
+graceful_timeout = settings.GRACEFUL_TIMEOUT
+keepalive = 5
+accesslog = "-"
+
+
+def post_fork(server, worker):
+    # The engine was created in the master while preloading the app; give
+    # each worker its own connection pool instead of sharing sockets
+    from models.base import engine, replica_engines
+
+    engine.dispose(close=False)
+    for replica in replica_engines:
+        replica.dispose(close=False)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
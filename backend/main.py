@@ -1,5 +1,6 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 import uvicorn
 import sys
 import os
@@ -8,18 +9,22 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Import our modules (works both locally and in Docker)
+from core.compression import CompressionMiddleware
 from core.config import settings
-from models.base import Base, engine
-from routers import auth, documents, ai
+from core.metrics import CONTENT_TYPE_LATEST, MetricsMiddleware, instrument_engine, metrics_response_body
+from core.profiling import ProfilingMiddleware
+from models.base import engine, replica_engines
+from routers import auth, documents, ai, profiles
 
-# Create database tables (in development, use Alembic for production)
-Base.metadata.create_all(bind=engine)
+# The database schema is managed by Alembic: run `alembic upgrade head`
+# before starting the app
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     description="API for AI-powered writing assistant and PDF research summarizer",
     version="0.1.0",
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -31,6 +36,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large responses (gzip/brotli, negotiated with Accept-Encoding)
+app.add_middleware(CompressionMiddleware)
+
+# Record request latency and DB query counts per route
+instrument_engine(engine)
+for replica in replica_engines:
+    instrument_engine(replica)
+app.add_middleware(MetricsMiddleware)
+
+# Profile individual requests on demand (admins) or by sampling rate
+app.add_middleware(ProfilingMiddleware)
+
 # Root endpoint
 @app.get("/")
 async def root():
@@ -41,10 +58,20 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+# Prometheus metrics endpoint
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(content=metrics_response_body(), media_type=CONTENT_TYPE_LATEST)
+
 # Import and include routers
 app.include_router(auth.router, prefix=settings.API_V1_STR)
 app.include_router(documents.router, prefix=f"{settings.API_V1_STR}/documents", tags=["Documents"])
 app.include_router(ai.router, prefix=f"{settings.API_V1_STR}/ai", tags=["AI Services"])
+app.include_router(profiles.router, prefix=f"{settings.API_V1_STR}/profiles", tags=["Profiles"])
 
 if __name__ == "__main__":
+    if "--prod" in sys.argv:
+        # Multi-worker production server (see gunicorn.conf.py)
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
+        os.execvp("gunicorn", ["gunicorn", "-c", "gunicorn.conf.py", "main:app"])
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,54 @@
+"""Tables that predate the first migration
+
+The first migration (3befe0e7133f) alters tables that used to be created by
+Base.metadata.create_all() at application startup. env.py creates them, as
+they were then, on an empty database before running the migrations, so a new
+database can be brought up with `alembic upgrade head` alone.
+"""
+import sqlalchemy as sa
+
+metadata = sa.MetaData()
+
+sa.Table(
+    'users', metadata,
+    sa.Column('id', sa.Integer(), primary_key=True, index=True),
+    sa.Column('email', sa.String(), nullable=False, unique=True, index=True),
+    sa.Column('username', sa.String(), nullable=False, unique=True, index=True),
+    sa.Column('hashed_password', sa.String(), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('is_superuser', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+)
+
+sa.Table(
+    'documents', metadata,
+    sa.Column('id', sa.Integer(), primary_key=True, index=True),
+    sa.Column('title', sa.String(), nullable=True, index=True),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('file_path', sa.String(), nullable=False),
+    sa.Column('file_type', sa.String(), nullable=False),
+    sa.Column('file_size', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+)
+
+sa.Table(
+    'document_chunks', metadata,
+    sa.Column('id', sa.Integer(), primary_key=True, index=True),
+    sa.Column('document_id', sa.Integer(), sa.ForeignKey('documents.id', ondelete='CASCADE'), nullable=True),
+    sa.Column('chunk_id', sa.String(), nullable=False, index=True),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.Column('page_number', sa.Integer(), nullable=True),
+    sa.Column('chunk_index', sa.Integer(), nullable=False),
+    sa.Column('vector_id', sa.String(), nullable=True),
+)
+
+
+def create_if_empty(connection) -> None:
+    """
+    Create the base tables if the database has no tables at all
+    """
+    if not sa.inspect(connection).get_table_names():
+        metadata.create_all(connection)
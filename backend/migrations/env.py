@@ -19,6 +19,11 @@ from core.config import settings
 # Import all models to ensure they're registered with the metadata
 from models.user import User
 from models.document import Document
+from models.document_chunk import DocumentChunk
+from models.rate_limit import RateLimitBucket
+from models.embedding import EmbeddingCache
+
+from migrations.base_schema import create_if_empty
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -80,6 +85,12 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
+        # A new database first gets the tables that predate the first migration.
+        # Commit either way, so the migrations don't run inside the transaction
+        # that inspecting the database began.
+        create_if_empty(connection)
+        connection.commit()
+
         context.configure(
             connection=connection, target_metadata=target_metadata
         )
@@ -0,0 +1,30 @@
+"""Add rate limit buckets table
+
+Revision ID: 5d8e1b3c7a20
+Revises: 8c2f4a1d9e57
+Create Date: 2026-10-19 11:40:05.207913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d8e1b3c7a20'
+down_revision = '8c2f4a1d9e57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'rate_limit_buckets',
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('tokens', sa.Float(), nullable=False),
+        sa.Column('updated_at', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('key')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('rate_limit_buckets')
@@ -0,0 +1,24 @@
+"""Add section column to document chunks
+
+Revision ID: 8c2f4a1d9e57
+Revises: 3befe0e7133f
+Create Date: 2026-10-19 09:12:44.318020
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c2f4a1d9e57'
+down_revision = '3befe0e7133f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('document_chunks', sa.Column('section', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('document_chunks', 'section')
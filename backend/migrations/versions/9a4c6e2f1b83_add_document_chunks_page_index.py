@@ -0,0 +1,29 @@
+"""Add composite (document_id, page_number, chunk_index) index to document chunks
+
+Revision ID: 9a4c6e2f1b83
+Revises: 5d8e1b3c7a20
+Create Date: 2026-10-19 15:02:37.540118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4c6e2f1b83'
+down_revision = '5d8e1b3c7a20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_document_chunks_document_page_index',
+        'document_chunks',
+        ['document_id', 'page_number', 'chunk_index'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_document_chunks_document_page_index', table_name='document_chunks')
@@ -0,0 +1,105 @@
+"""Hash-partition document_chunks by document_id
+
+Revision ID: a8d3e6f19c52
+Revises: f5b2c8d04e19
+Create Date: 2026-10-19 17:58:03.815442
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8d3e6f19c52'
+down_revision = 'f5b2c8d04e19'
+branch_labels = None
+depends_on = None
+
+# Number of hash partitions; changing it later means rewriting the table
+PARTITIONS = 16
+
+COLUMNS = "id, document_id, chunk_id, content, page_number, chunk_index, section, vector_id"
+
+
+def _create_indexes(table: str, suffix: str = '') -> None:
+    # On a partitioned table these are created on every partition (local indexes)
+    op.execute(f"CREATE INDEX ix_document_chunks_id{suffix} ON {table} (id)")
+    op.execute(f"CREATE INDEX ix_document_chunks_chunk_id{suffix} ON {table} (chunk_id)")
+    op.execute(
+        f"CREATE INDEX ix_document_chunks_document_page_index{suffix} "
+        f"ON {table} (document_id, page_number, chunk_index)"
+    )
+    op.execute(f"CREATE INDEX ix_document_chunks_content_tsv{suffix} ON {table} USING gin (content_tsv)")
+
+
+def _rename_indexes(suffix: str) -> None:
+    for name in ('id', 'chunk_id', 'document_page_index', 'content_tsv'):
+        op.execute(f"ALTER INDEX ix_document_chunks_{name}{suffix} RENAME TO ix_document_chunks_{name}")
+
+
+def _swap_tables(new_table: str) -> None:
+    """Copy all rows into `new_table`, drop the old table and take over its names"""
+    op.execute("LOCK TABLE document_chunks IN ACCESS EXCLUSIVE MODE")
+    op.execute(f"INSERT INTO {new_table} ({COLUMNS}) SELECT {COLUMNS} FROM document_chunks")
+    op.execute("DROP TABLE document_chunks")
+    op.execute(f"ALTER TABLE {new_table} RENAME TO document_chunks")
+    op.execute("ALTER SEQUENCE document_chunks_new_id_seq RENAME TO document_chunks_id_seq")
+    op.execute("ALTER SEQUENCE document_chunks_id_seq OWNED BY document_chunks.id")
+    op.execute(
+        "SELECT setval('document_chunks_id_seq', coalesce((SELECT max(id) FROM document_chunks), 0) + 1, false)"
+    )
+    _rename_indexes('_new')
+
+
+def _create_table_sql(table: str, partitioned: bool) -> str:
+    # Primary keys of partitioned tables must include the partition key; the
+    # plain table is restored exactly, with a nullable document_id
+    primary_key = "PRIMARY KEY (document_id, id)" if partitioned else "PRIMARY KEY (id)"
+    document_id_null = "NOT NULL" if partitioned else "NULL"
+    return f"""
+        CREATE TABLE {table} (
+            id INTEGER NOT NULL DEFAULT nextval('document_chunks_new_id_seq'),
+            document_id INTEGER {document_id_null} REFERENCES documents (id) ON DELETE CASCADE,
+            chunk_id UUID NOT NULL,
+            content TEXT NOT NULL,
+            page_number INTEGER,
+            chunk_index INTEGER NOT NULL,
+            section VARCHAR,
+            vector_id VARCHAR,
+            content_tsv tsvector GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED,
+            {primary_key}
+        ){" PARTITION BY HASH (document_id)" if partitioned else ""}
+    """
+
+
+def upgrade() -> None:
+    # Partitioning is Postgres only; other databases keep the plain table, where
+    # ix_document_chunks_document_page_index already serves per-document reads
+    # and the cascade delete
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    # Chunks without a document can't be placed in a partition (or reached by the app)
+    op.execute("DELETE FROM document_chunks WHERE document_id IS NULL")
+
+    op.execute("CREATE SEQUENCE document_chunks_new_id_seq")
+    op.execute(_create_table_sql('document_chunks_new', partitioned=True))
+    for remainder in range(PARTITIONS):
+        op.execute(
+            f"CREATE TABLE document_chunks_p{remainder} PARTITION OF document_chunks_new "
+            f"FOR VALUES WITH (MODULUS {PARTITIONS}, REMAINDER {remainder})"
+        )
+    _create_indexes('document_chunks_new', suffix='_new')
+    _swap_tables('document_chunks_new')
+    op.execute("ANALYZE document_chunks")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute("CREATE SEQUENCE document_chunks_new_id_seq")
+    op.execute(_create_table_sql('document_chunks_new', partitioned=False))
+    _create_indexes('document_chunks_new', suffix='_new')
+    # Partitions are dropped together with the partitioned table
+    _swap_tables('document_chunks_new')
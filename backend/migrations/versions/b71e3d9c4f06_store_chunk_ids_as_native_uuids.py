@@ -0,0 +1,51 @@
+"""Store document chunk IDs as native UUIDs
+
+Revision ID: b71e3d9c4f06
+Revises: 9a4c6e2f1b83
+Create Date: 2026-10-19 15:48:12.661394
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b71e3d9c4f06'
+down_revision = '9a4c6e2f1b83'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        # 16-byte uuid instead of 36-character text; existing uuid4 strings cast directly
+        op.alter_column(
+            'document_chunks', 'chunk_id',
+            type_=sa.Uuid(), existing_type=sa.String(), existing_nullable=False,
+            postgresql_using='chunk_id::uuid'
+        )
+    else:
+        # Without a native type, SQLAlchemy stores UUIDs as 32 hex characters
+        op.execute("UPDATE document_chunks SET chunk_id = lower(replace(chunk_id, '-', ''))")
+        with op.batch_alter_table('document_chunks') as batch_op:
+            batch_op.alter_column(
+                'chunk_id', type_=sa.Uuid(), existing_type=sa.String(), existing_nullable=False
+            )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.alter_column(
+            'document_chunks', 'chunk_id',
+            type_=sa.String(), existing_type=sa.Uuid(), existing_nullable=False,
+            postgresql_using='chunk_id::text'
+        )
+    else:
+        with op.batch_alter_table('document_chunks') as batch_op:
+            batch_op.alter_column(
+                'chunk_id', type_=sa.String(), existing_type=sa.Uuid(), existing_nullable=False
+            )
+        op.execute(
+            "UPDATE document_chunks SET chunk_id = substr(chunk_id, 1, 8) || '-' || substr(chunk_id, 9, 4) "
+            "|| '-' || substr(chunk_id, 13, 4) || '-' || substr(chunk_id, 17, 4) || '-' || substr(chunk_id, 21)"
+        )
@@ -0,0 +1,26 @@
+"""Add deleted_at to documents for soft deletes
+
+Revision ID: c4f7a2e8d613
+Revises: a8d3e6f19c52
+Create Date: 2026-10-19 18:41:27.560914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4f7a2e8d613'
+down_revision = 'a8d3e6f19c52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('documents', sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index(op.f('ix_documents_deleted_at'), 'documents', ['deleted_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_documents_deleted_at'), table_name='documents')
+    op.drop_column('documents', 'deleted_at')
@@ -0,0 +1,24 @@
+"""Index rate_limit_buckets.updated_at for pruning idle buckets
+
+Revision ID: d2b6f8a41e73
+Revises: c4f7a2e8d613
+Create Date: 2026-10-19 21:12:44.108352
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2b6f8a41e73'
+down_revision = 'c4f7a2e8d613'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_rate_limit_buckets_updated_at'), 'rate_limit_buckets', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_rate_limit_buckets_updated_at'), table_name='rate_limit_buckets')
@@ -0,0 +1,24 @@
+"""Add last_write_at to users for read-your-writes replica routing
+
+Revision ID: e8c1a5d93b27
+Revises: d2b6f8a41e73
+Create Date: 2026-10-19 22:05:18.640217
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8c1a5d93b27'
+down_revision = 'd2b6f8a41e73'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('last_write_at', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'last_write_at')
@@ -0,0 +1,38 @@
+"""Add generated tsvector column and GIN index for chunk full-text search
+
+Revision ID: f5b2c8d04e19
+Revises: e3a9f2c71d48
+Create Date: 2026-10-19 17:10:26.472930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f5b2c8d04e19'
+down_revision = 'e3a9f2c71d48'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Full-text search is Postgres only; other databases use the keyword backend
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    # Generated column: kept up to date by Postgres, never written by the app
+    op.execute(
+        "ALTER TABLE document_chunks ADD COLUMN content_tsv tsvector "
+        "GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED"
+    )
+    op.create_index(
+        'ix_document_chunks_content_tsv', 'document_chunks', ['content_tsv'],
+        unique=False, postgresql_using='gin'
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.drop_index('ix_document_chunks_content_tsv', table_name='document_chunks')
+    op.drop_column('document_chunks', 'content_tsv')
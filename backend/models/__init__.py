@@ -2,6 +2,8 @@ from models.base import Base, get_db
 from models.user import User
 from models.document import Document
 from models.document_chunk import DocumentChunk
+from models.rate_limit import RateLimitBucket
+from models.embedding import EmbeddingCache
 
 # Export all models for easy importing
-__all__ = ["Base", "get_db", "User", "Document", "DocumentChunk"]
+__all__ = ["Base", "get_db", "User", "Document", "DocumentChunk", "RateLimitBucket", "EmbeddingCache"]
@@ -1,26 +1,235 @@
-from sqlalchemy import create_engine
+import itertools
+import logging
+import os
+import threading
+import time
+from typing import List, Optional
+
+from fastapi import Request
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 
 from core.config import settings
 
+# Set up logging
+logger = logging.getLogger(__name__)
+
 # Create a SQLAlchemy engine using the DATABASE_URL from settings
 engine = create_engine(settings.DATABASE_URL)
 
+
+def _create_replica_engine(url: str) -> Engine:
+    # A replica that doesn't answer should fail its health check quickly
+    connect_args = {}
+    if make_url(url).get_backend_name() == "postgresql":
+        connect_args["connect_timeout"] = settings.REPLICA_CONNECT_TIMEOUT_SECONDS
+    return create_engine(url, pool_pre_ping=True, connect_args=connect_args)
+
+
+# Read replicas (DATABASE_REPLICA_URLS); read-only dependencies are routed to them
+replica_engines = [
+    _create_replica_engine(url.strip()) for url in settings.DATABASE_REPLICA_URLS.split(",") if url.strip()
+]
+
 # Create a SessionLocal class for database sessions
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Create a Base class for declarative models
 Base = declarative_base()
 
+# Read-your-writes: when a request's get_db session commits a write, the time
+# is recorded in users.last_write_at on the primary. get_current_user reads the
+# user from the primary and keeps the request's reads there for
+# REPLICA_STICKY_SECONDS after that, whichever worker or client sends them.
+# Only the writer's own reads are covered; other users may briefly see data
+# up to REPLICA_MAX_LAG_SECONDS old.
+RECORD_WRITE_QUERY = text("UPDATE users SET last_write_at = :now WHERE id = :user_id")
+
+# Replica lag on Postgres; 0 when the replica has replayed everything it received
+REPLICA_LAG_QUERY = text("""
+    SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0) END
+""")
+
+
+def _describe(replica: Engine) -> str:
+    return replica.url.render_as_string(hide_password=True)
+
+
+class ReplicaPool:
+    """
+    Round-robin choice among healthy replica engines
+
+    A background thread health checks every replica (a round trip and, on
+    Postgres, its replication lag) every `check_interval` seconds, so choosing
+    a replica never waits on the network. Replicas count as unhealthy until
+    their first check passes, and are skipped while their last check failed.
+    """
+
+    def __init__(self, engines: List[Engine], check_interval: float, max_lag: float):
+        self.engines = engines
+        self.check_interval = check_interval
+        self.max_lag = max_lag
+        self._healthy = {id(replica): False for replica in engines}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._checker_pid: Optional[int] = None
+
+    def choose(self) -> Optional[Engine]:
+        """
+        Get the next healthy replica, or None if there is none
+        """
+        if not self.engines:
+            return None
+        self._start_checker()
+        start = next(self._counter)
+        for offset in range(len(self.engines)):
+            replica = self.engines[(start + offset) % len(self.engines)]
+            if self._healthy[id(replica)]:
+                return replica
+        return None
+
+    def _start_checker(self) -> None:
+        # Threads don't survive a fork, so each worker process starts its own
+        pid = os.getpid()
+        if self._checker_pid == pid:
+            return
+        with self._lock:
+            if self._checker_pid == pid:
+                return
+            self._checker_pid = pid
+            threading.Thread(target=self._check_forever, name="replica-health", daemon=True).start()
+
+    def _check_forever(self) -> None:
+        while True:
+            for replica in self.engines:
+                self._healthy[id(replica)] = self.check(replica)
+            time.sleep(self.check_interval)
+
+    def check(self, replica: Engine) -> bool:
+        """
+        Check that a replica answers and is not lagging more than max_lag seconds
+        """
+        try:
+            with replica.connect() as conn:
+                if replica.dialect.name == "postgresql":
+                    lag = float(conn.execute(REPLICA_LAG_QUERY).scalar() or 0)
+                    if lag > self.max_lag:
+                        logger.warning(f"Replica {_describe(replica)} is {lag:.1f}s behind; not using it")
+                        return False
+                else:
+                    conn.execute(text("SELECT 1"))
+            return True
+        except Exception as e:
+            logger.warning(f"Replica {_describe(replica)} failed its health check: {str(e)}")
+            return False
+
+    def mark_unhealthy(self, replica: Engine) -> None:
+        """
+        Stop using a replica until its next health check passes
+        """
+        self._healthy[id(replica)] = False
+
+
+replicas = ReplicaPool(replica_engines, settings.REPLICA_HEALTH_CHECK_SECONDS, settings.REPLICA_MAX_LAG_SECONDS)
+
+
+class ReadSession(Session):
+    """
+    Session for read-only work
+
+    The engine is picked on first use: a healthy replica, or the primary when
+    there is none or use_primary() was called (e.g. for a user who just wrote).
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self.info.get("primary"):
+            return engine
+        if "replica" not in self.info:
+            self.info["replica"] = replicas.choose()
+        return self.info["replica"] or engine
+
+
+ReadSessionLocal = sessionmaker(class_=ReadSession, autocommit=False, autoflush=False)
+
+
+@event.listens_for(ReadSessionLocal, "before_flush")
+def _reject_replica_writes(session, flush_context, instances):
+    if session.info.get("replica") is not None and not session.info.get("primary"):
+        raise RuntimeError("Read sessions routed to a replica can't write; use get_db")
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _record_flush(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _record_write_statement(orm_execute_state):
+    # Bulk inserts, updates and deletes bypass the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _forget_writes(session):
+    session.info.pop("wrote", None)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _record_writer(session):
+    # Only request sessions (get_db) know their user; writes from other
+    # sessions (rate limiting, cleanup jobs) don't affect read routing
+    request = session.info.get("request")
+    user_id = getattr(request.state, "user_id", None) if request is not None else None
+    if session.info.pop("wrote", False) and user_id is not None:
+        with engine.begin() as conn:
+            conn.execute(RECORD_WRITE_QUERY, {"now": time.time(), "user_id": user_id})
+
+
+def use_primary(db: Session) -> None:
+    """
+    Route a read session to the primary (must be called before its first query)
+    """
+    db.info["primary"] = True
+
+
+def wrote_recently(last_write_at: Optional[float]) -> bool:
+    """
+    Whether a user's last write is recent enough that their reads should go to the primary
+    """
+    return last_write_at is not None and time.time() - last_write_at < settings.REPLICA_STICKY_SECONDS
+
 # Database dependency
-def get_db():
+def get_db(request: Request):
     """
     Dependency function that yields a SQLAlchemy database session
     and ensures it's closed after use.
+
+    Committed writes are recorded for the authenticated user of the request.
+    """
+    db = SessionLocal(info={"request": request})
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_read_db():
+    """
+    Dependency function that yields a read-only session, served by a replica
+    when one is healthy and the user hasn't written recently (get_current_user
+    decides). Routes that write must use get_db.
     """
-    db = SessionLocal()
+    db = ReadSessionLocal()
     try:
         yield db
+    except DBAPIError as e:
+        replica = db.info.get("replica")
+        if replica is not None and e.connection_invalidated:
+            replicas.mark_unhealthy(replica)
+        raise
     finally:
         db.close()
@@ -20,6 +20,7 @@ class Document(Base):
     user_id = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    deleted_at = Column(DateTime(timezone=True), nullable=True, index=True)  # Set when deleted, until cleanup removes the row
 
     # Define relationship with User
     user = relationship("User", backref="documents")
@@ -41,3 +42,28 @@ class Document(Base):
         db.commit()
         db.refresh(document)
         return document
+
+    @classmethod
+    def query_active(cls, db, *entities):
+        """
+        Query documents that have not been deleted
+        """
+        return db.query(*(entities or (cls,))).filter(cls.deleted_at.is_(None))
+
+    @classmethod
+    def soft_delete(cls, db, user_id, document_ids=None, batch_size=500):
+        """
+        Mark a user's documents (all of them if `document_ids` is None) as deleted
+        and return the IDs that were marked. Their chunks and files are removed
+        later by utils.cleanup.
+        """
+        query = cls.query_active(db, cls.id).filter(cls.user_id == user_id)
+        if document_ids is not None:
+            query = query.filter(cls.id.in_(document_ids))
+        ids = [row.id for row in query.order_by(cls.id)]
+        for start in range(0, len(ids), batch_size):
+            db.query(cls).filter(cls.id.in_(ids[start:start + batch_size])).update(
+                {cls.deleted_at: func.now()}, synchronize_session=False
+            )
+        db.commit()
+        return ids
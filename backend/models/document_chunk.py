@@ -1,5 +1,7 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, Float
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Float, Index, PrimaryKeyConstraint, Uuid, delete, insert, select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import backref, relationship
+from sqlalchemy.schema import CreateColumn
 
 from models.base import Base
 
@@ -8,20 +10,30 @@ class DocumentChunk(Base):
     Model for storing document chunks for vector search
     """
     __tablename__ = "document_chunks"
+    __table_args__ = (
+        PrimaryKeyConstraint("document_id", "id"),
+        # Serves page-range reads in reading order
+        Index("ix_document_chunks_document_page_index", "document_id", "page_number", "chunk_index"),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
-    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"))
-    chunk_id = Column(String, index=True, nullable=False)  # Unique ID for the chunk
+    # The primary key includes the partition key, as on the partitioned Postgres table
+    # (see __table_args__ for its column order)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True, nullable=False)
+    chunk_id = Column(Uuid, index=True, nullable=False)  # Unique, time-ordered (UUIDv7) ID for the chunk
     content = Column(Text, nullable=False)  # Text content of the chunk
     page_number = Column(Integer, nullable=True)  # Page number where the chunk is from
     chunk_index = Column(Integer, nullable=False)  # Index of the chunk within the document
+    section = Column(String, nullable=True)  # Heading path of the section the chunk is from
     vector_id = Column(String, nullable=True)  # ID for retrieval from vector DB
     
-    # Define relationship with Document
-    document = relationship("Document", backref="chunks")
+    # Define relationship with Document. Chunks are removed by the database's
+    # ON DELETE CASCADE; on Postgres the table is hash-partitioned by document_id,
+    # so the ORM must not null it out (which would move rows between partitions)
+    document = relationship("Document", backref=backref("chunks", passive_deletes=True))
     
     @classmethod
-    def create(cls, db, document_id, chunk_id, content, page_number, chunk_index, vector_id=None):
+    def create(cls, db, document_id, chunk_id, content, page_number, chunk_index, vector_id=None, section=None):
         """
         Create a new document chunk record
         """
@@ -31,7 +43,8 @@ class DocumentChunk(Base):
             content=content,
             page_number=page_number,
             chunk_index=chunk_index,
-            vector_id=vector_id
+            vector_id=vector_id,
+            section=section
         )
         db.add(chunk)
         db.commit()
@@ -44,3 +57,91 @@ class DocumentChunk(Base):
         Get all chunks for a document
         """
         return db.query(cls).filter(cls.document_id == document_id).offset(skip).limit(limit).all()
+
+    @classmethod
+    def query_by_page_range(cls, db, document_id, first_page=None, last_page=None):
+        """
+        Query the chunks of a document within pages [first_page, last_page], in reading order
+        """
+        query = db.query(cls).filter(cls.document_id == document_id)
+        if first_page is not None:
+            query = query.filter(cls.page_number >= first_page)
+        if last_page is not None:
+            query = query.filter(cls.page_number <= last_page)
+        return query.order_by(cls.page_number, cls.chunk_index)
+
+    @classmethod
+    def get_by_chunk_ids(cls, db, document_id, chunk_ids):
+        """
+        Get the chunks of a document with the given chunk IDs, in reading order
+        """
+        if not chunk_ids:
+            return []
+        return (
+            db.query(cls)
+            .filter(cls.document_id == document_id, cls.chunk_id.in_(chunk_ids))
+            .order_by(cls.page_number, cls.chunk_index)
+            .all()
+        )
+
+    @classmethod
+    def bulk_create(cls, db, document_id, chunks, vector_ids=None):
+        """
+        Insert many chunk records for a document in a single statement.
+        `chunks` is an iterable of (chunk_id, content, page_number, chunk_index, section)
+        tuples, and `vector_ids` an optional list of vector IDs in the same order.
+        The caller is responsible for committing.
+        """
+        rows = [
+            {
+                "document_id": document_id,
+                "chunk_id": chunk_id,
+                "content": content,
+                "page_number": page_number,
+                "chunk_index": chunk_index,
+                "section": section,
+                "vector_id": None,
+            }
+            for chunk_id, content, page_number, chunk_index, section in chunks
+        ]
+        if vector_ids is not None:
+            for row, vector_id in zip(rows, vector_ids):
+                row["vector_id"] = vector_id
+        if rows:
+            db.execute(insert(cls), rows)
+        return len(rows)
+
+    @classmethod
+    def delete_by_document_id(cls, db, document_id):
+        """
+        Delete all chunks for a document. The caller is responsible for committing.
+        """
+        result = db.execute(delete(cls).where(cls.document_id == document_id))
+        return result.rowcount
+
+    @classmethod
+    def delete_batch(cls, db, document_id, batch_size=1000):
+        """
+        Delete up to `batch_size` chunks of a document, so a large document can be
+        removed in short transactions. The caller is responsible for committing.
+        """
+        batch = select(cls.id).where(cls.document_id == document_id).limit(batch_size)
+        result = db.execute(delete(cls).where(cls.document_id == document_id, cls.id.in_(batch)))
+        return result.rowcount
+
+
+# SQLite can only generate IDs for a single INTEGER PRIMARY KEY column, so
+# create_all() on SQLite (development, benchmarks) keys the table on id alone,
+# like the unpartitioned table the migrations keep on databases other than Postgres
+@compiles(CreateColumn, "sqlite")
+def _create_chunk_id_column(element, compiler, **kw):
+    if element.element is DocumentChunk.__table__.c.id:
+        return f"{compiler.preparer.format_column(element.element)} INTEGER NOT NULL"
+    return compiler.visit_create_column(element, **kw)
+
+
+@compiles(PrimaryKeyConstraint, "sqlite")
+def _create_chunk_primary_key(constraint, compiler, **kw):
+    if constraint.table is DocumentChunk.__table__:
+        return "PRIMARY KEY (id)"
+    return compiler.visit_primary_key_constraint(constraint, **kw)
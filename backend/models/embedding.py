@@ -0,0 +1,65 @@
+from sqlalchemy import Column, DateTime, Integer, LargeBinary, String, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.sql import func
+
+from models.base import Base
+
+class EmbeddingCache(Base):
+    """
+    Embedding vectors keyed by the content hash of the normalized chunk text and
+    the model, shared across documents and users
+    """
+    __tablename__ = "embedding_cache"
+
+    content_hash = Column(String(64), primary_key=True)  # sha256 of model + normalized text
+    model = Column(String, nullable=False)  # Embedding model that produced the vector
+    dimensions = Column(Integer, nullable=False)
+    vector = Column(LargeBinary, nullable=False)  # float32 values, native byte order
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    @classmethod
+    def get_existing(cls, db, content_hashes, batch_size=500):
+        """
+        Get the subset of content hashes that have a cached vector
+        """
+        content_hashes = list(content_hashes)
+        found = set()
+        for start in range(0, len(content_hashes), batch_size):
+            found.update(db.execute(
+                select(cls.content_hash).where(cls.content_hash.in_(content_hashes[start:start + batch_size]))
+            ).scalars())
+        return found
+
+    @classmethod
+    def get_many(cls, db, content_hashes, batch_size=500):
+        """
+        Get cached vectors by content hash as a {content_hash: vector bytes} dict
+        """
+        content_hashes = list(content_hashes)
+        found = {}
+        for start in range(0, len(content_hashes), batch_size):
+            rows = db.execute(
+                select(cls.content_hash, cls.vector)
+                .where(cls.content_hash.in_(content_hashes[start:start + batch_size]))
+            )
+            found.update((row.content_hash, row.vector) for row in rows)
+        return found
+
+    @classmethod
+    def put_many(cls, db, rows):
+        """
+        Insert cache entries, skipping hashes another request stored first.
+        `rows` is a list of dicts with content_hash, model, dimensions and vector.
+        The caller is responsible for committing.
+        """
+        if not rows:
+            return
+        dialect = db.get_bind().dialect.name
+        if dialect == "postgresql":
+            db.execute(pg_insert(cls).on_conflict_do_nothing(index_elements=["content_hash"]), rows)
+        elif dialect == "sqlite":
+            db.execute(sqlite_insert(cls).on_conflict_do_nothing(index_elements=["content_hash"]), rows)
+        else:
+            existing = cls.get_existing(db, [row["content_hash"] for row in rows])
+            db.add_all([cls(**row) for row in rows if row["content_hash"] not in existing])
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Float, String
+
+from models.base import Base
+
+class RateLimitBucket(Base):
+    """
+    Token bucket state shared between workers by the database rate limit store
+    """
+    __tablename__ = "rate_limit_buckets"
+
+    key = Column(String, primary_key=True)  # "<route>:<user id>"
+    tokens = Column(Float, nullable=False)  # Tokens left at updated_at
+    updated_at = Column(Float, nullable=False, index=True)  # Unix time of the last refill
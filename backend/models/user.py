@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, DateTime, Integer, String
+from sqlalchemy import Boolean, Column, DateTime, Float, Integer, String
 from sqlalchemy.sql import func
 from passlib.context import CryptContext
 
@@ -21,6 +21,7 @@ class User(Base):
     is_superuser = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    last_write_at = Column(Float, nullable=True)  # Unix time of the last committed write (replica routing)
 
     @classmethod
     def create(cls, db, email, username, password):
@@ -0,0 +1,295 @@
+"""Rebuild chunks for every stored document
+
+Walks all `Document` rows, loads their page text (from the text cache, or by
+re-extracting the uploaded file) and re-runs chunking in a pool of worker
+processes. Results are written back by a small set of writer threads so the
+number of concurrent DB writes stays bounded. Completed document IDs are
+appended to a checkpoint file, so an interrupted run can be resumed by running
+the same command again.
+
+Usage:
+    python reindex.py --workers 8 --max-db-writes 4
+    python reindex.py --user-id 42 --restart
+    python reindex.py --embed                   # also embed chunks missing from the embedding cache
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Iterator, List, Optional, Set, Tuple
+
+# Add the current directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.config import settings
+from models.base import SessionLocal
+from models.document import Document
+from models.document_chunk import DocumentChunk
+from utils.document_processor import chunk_pages, generate_chunk_id
+from utils.embeddings import embed_texts
+from utils.shards import invalidate_user
+from utils.text_cache import get_document_pages
+
+logger = logging.getLogger("reindex")
+
+
+class Checkpoint:
+    """
+    Append-only record of document IDs that have been fully re-indexed
+    """
+
+    def __init__(self, path: str, restart: bool = False):
+        self.path = path
+        self.done: Set[int] = set()
+        self._lock = threading.Lock()
+
+        if restart and os.path.exists(path):
+            os.remove(path)
+        if os.path.exists(path):
+            with open(path) as f:
+                self.done = {int(line) for line in f if line.strip()}
+
+        self._file = open(path, "a")
+
+    def mark(self, document_id: int) -> None:
+        with self._lock:
+            self.done.add(document_id)
+            self._file.write(f"{document_id}\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class Progress:
+    """
+    Thread-safe counters with periodic throughput logging
+    """
+
+    def __init__(self, total: int, interval: float = 5.0):
+        self.total = total
+        self.interval = interval
+        self.documents = 0
+        self.chunks = 0
+        self.failed = 0
+        self.started = time.monotonic()
+        self._last_report = self.started
+        self._lock = threading.Lock()
+
+    def record(self, chunks: int = 0, failed: bool = False) -> None:
+        with self._lock:
+            if failed:
+                self.failed += 1
+            else:
+                self.documents += 1
+                self.chunks += chunks
+            now = time.monotonic()
+            if now - self._last_report >= self.interval:
+                self._last_report = now
+                self.report()
+
+    def report(self) -> None:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        logger.info(
+            f"{self.documents}/{self.total} documents ({self.failed} failed), "
+            f"{self.chunks} chunks, {self.documents / elapsed:.1f} docs/s, "
+            f"{self.chunks / elapsed:.1f} chunks/s"
+        )
+
+
+def iter_documents(batch_size: int, user_id: Optional[int] = None) -> Iterator[Tuple[int, str, str]]:
+    """
+    Yield (id, file_path, file_type) for all documents using keyset pagination,
+    so the scan never holds a long-running cursor open
+    """
+    last_id = 0
+    while True:
+        db = SessionLocal()
+        try:
+            query = Document.query_active(db, Document.id, Document.file_path, Document.file_type) \
+                .filter(Document.id > last_id)
+            if user_id is not None:
+                query = query.filter(Document.user_id == user_id)
+            rows = query.order_by(Document.id).limit(batch_size).all()
+        finally:
+            db.close()
+
+        if not rows:
+            return
+        for row in rows:
+            yield row.id, row.file_path, row.file_type
+        last_id = rows[-1].id
+
+
+def count_documents(user_id: Optional[int] = None, exclude: Set[int] = frozenset(),
+                    batch_size: int = 1000) -> int:
+    """
+    Count the documents a run will process, leaving out the IDs in `exclude`
+
+    The checkpoint can hold IDs outside the current selection (other users'
+    documents, or documents deleted since), so excluded IDs are matched
+    against the selected ones rather than subtracted.
+    """
+    if exclude:
+        return sum(1 for document_id, _, _ in iter_documents(batch_size, user_id) if document_id not in exclude)
+    db = SessionLocal()
+    try:
+        query = Document.query_active(db)
+        if user_id is not None:
+            query = query.filter(Document.user_id == user_id)
+        return query.count()
+    finally:
+        db.close()
+
+
+def extract_chunks(document_id: int, file_path: str, file_type: str,
+                   refresh_cache: bool = False,
+                   strategy: str = "fixed") -> Tuple[int, List[Tuple[int, str, int, Optional[str]]]]:
+    """
+    Load a stored document's page text and split it into chunks (runs in a worker process).
+    Page text comes from the text cache; the file itself is only parsed on a cache miss.
+    """
+    pages = get_document_pages(file_path, file_type, refresh=refresh_cache)
+    return document_id, chunk_pages(
+        pages,
+        strategy=strategy,
+        max_tokens=settings.CHUNK_MAX_TOKENS,
+        overlap_tokens=settings.CHUNK_OVERLAP_TOKENS
+    )
+
+
+def write_chunks(document_id: int, chunks: List[Tuple[int, str, int, Optional[str]]], embed: bool = False) -> int:
+    """
+    Replace all chunks of a document and update its chunk count in one transaction
+    """
+    db = SessionLocal()
+    try:
+        # Embed before opening the write transaction; cached texts are skipped
+        vector_ids = None
+        if embed:
+            vector_ids = asyncio.run(embed_texts(db, [chunk_text for _, chunk_text, _, _ in chunks]))
+
+        DocumentChunk.delete_by_document_id(db, document_id)
+        DocumentChunk.bulk_create(
+            db=db,
+            document_id=document_id,
+            chunks=[
+                (generate_chunk_id(), chunk_text, page_num, chunk_index, section)
+                for page_num, chunk_text, chunk_index, section in chunks
+            ],
+            vector_ids=vector_ids
+        )
+        db.query(Document).filter(Document.id == document_id).update({Document.chunk_count: len(chunks)})
+        db.commit()
+        user_id = db.query(Document.user_id).filter(Document.id == document_id).scalar()
+        if user_id is not None:
+            invalidate_user(user_id)
+        return len(chunks)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def reindex(workers: int, max_db_writes: int, batch_size: int, checkpoint: Checkpoint,
+            user_id: Optional[int] = None, refresh_cache: bool = False,
+            strategy: str = "fixed", embed: bool = False) -> Progress:
+    """
+    Re-index all documents not yet recorded in the checkpoint
+    """
+    progress = Progress(total=count_documents(user_id, exclude=checkpoint.done, batch_size=batch_size))
+    write_slots = threading.BoundedSemaphore(max_db_writes)
+    max_pending = workers * 2
+
+    def on_written(future, document_id):
+        write_slots.release()
+        try:
+            chunk_count = future.result()
+        except Exception as e:
+            logger.error(f"Error writing chunks for document {document_id}: {str(e)}")
+            progress.record(failed=True)
+            return
+        checkpoint.mark(document_id)
+        progress.record(chunks=chunk_count)
+
+    def drain(pending, writer, return_when):
+        done, still_pending = wait(pending, return_when=return_when)
+        for future in done:
+            document_id = pending[future]
+            try:
+                _, chunks = future.result()
+            except Exception as e:
+                logger.error(f"Error processing document {document_id}: {str(e)}")
+                progress.record(failed=True)
+                continue
+            # Block here when too many writes are in flight; this also stops
+            # new extraction work from being queued until the DB catches up
+            write_slots.acquire()
+            write = writer.submit(write_chunks, document_id, chunks, embed)
+            write.add_done_callback(lambda f, document_id=document_id: on_written(f, document_id))
+        return {future: pending[future] for future in still_pending}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool, ThreadPoolExecutor(max_workers=max_db_writes) as writer:
+        pending = {}
+        for document_id, file_path, file_type in iter_documents(batch_size, user_id):
+            if document_id in checkpoint.done:
+                continue
+            pending[pool.submit(extract_chunks, document_id, file_path, file_type, refresh_cache, strategy)] = document_id
+            if len(pending) >= max_pending:
+                pending = drain(pending, writer, FIRST_COMPLETED)
+        while pending:
+            pending = drain(pending, writer, FIRST_COMPLETED)
+
+    progress.report()
+    return progress
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Rebuild chunks for all stored documents")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="number of extraction worker processes")
+    parser.add_argument("--max-db-writes", type=int, default=4,
+                        help="maximum number of concurrent chunk write transactions")
+    parser.add_argument("--batch-size", type=int, default=500,
+                        help="number of document rows fetched per query")
+    parser.add_argument("--checkpoint", default="reindex.checkpoint",
+                        help="file recording completed document IDs")
+    parser.add_argument("--restart", action="store_true",
+                        help="ignore an existing checkpoint and re-index everything")
+    parser.add_argument("--user-id", type=int, default=None,
+                        help="only re-index documents owned by this user")
+    parser.add_argument("--refresh-cache", action="store_true",
+                        help="re-extract text from the original files instead of the page text cache")
+    parser.add_argument("--strategy", choices=["fixed", "semantic"], default=settings.CHUNKING_STRATEGY,
+                        help="chunking strategy (defaults to the CHUNKING_STRATEGY setting)")
+    parser.add_argument("--embed", action=argparse.BooleanOptionalAction, default=settings.EMBEDDINGS_ENABLED,
+                        help="embed chunks through the embedding cache (defaults to the EMBEDDINGS_ENABLED setting)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    checkpoint = Checkpoint(args.checkpoint, restart=args.restart)
+    try:
+        progress = reindex(
+            workers=args.workers,
+            max_db_writes=args.max_db_writes,
+            batch_size=args.batch_size,
+            checkpoint=checkpoint,
+            user_id=args.user_id,
+            refresh_cache=args.refresh_cache,
+            strategy=args.strategy,
+            embed=args.embed
+        )
+    finally:
+        checkpoint.close()
+
+    return 1 if progress.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,2 +1,2 @@
 # Export routers for easy importing
-from routers import auth, documents, ai
+from routers import auth, documents, ai, profiles
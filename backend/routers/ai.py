@@ -1,15 +1,31 @@
+import asyncio
+import hashlib
+import logging
+import random
+import time
+
+import orjson
 from fastapi import APIRouter, Depends, HTTPException, status
-from pydantic import BaseModel
-from typing import Optional, Dict, Any, List
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Annotated, Optional, Dict, Any, List, Literal, Union
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from core.config import settings
+from core.metrics import IMPROVE_PARAGRAPHS, record_llm_call
+from core.rate_limit import RateLimit
 from models.base import get_db
 from models.user import User
 from routers.auth import get_current_user
+from utils.cache import TTLCache
+
+# Set up logging
+logger = logging.getLogger(__name__)
 
 # Create router with tags for OpenAPI documentation
-router = APIRouter(tags=["ai"])
+# Every AI route is rate limited per user, since each call goes to the upstream model
+router = APIRouter(tags=["ai"], dependencies=[Depends(RateLimit("ai", settings.RATE_LIMIT_AI))])
 
 # Define Pydantic models for request/response validation
 class TextImprovement(BaseModel):
@@ -34,9 +50,99 @@ class TextSummarizeRequest(BaseModel):
 class TextSummarizeResponse(BaseModel):
     summary: str
 
+class ParagraphInput(BaseModel):
+    hash: str  # Hex sha256 of the paragraph text (UTF-8)
+    text: Optional[str] = None  # May be omitted for paragraphs the server already has
+
+class IncrementalImproveRequest(BaseModel):
+    paragraphs: List[ParagraphInput] = Field(..., max_length=settings.IMPROVE_MAX_PARAGRAPHS)
+
+class ImprovedParagraph(BaseModel):
+    hash: str
+    original_text: str
+    improved_text: str
+    cached: bool
+
+class IncrementalImproveResponse(BaseModel):
+    paragraphs: List[ImprovedParagraph]
+    improved_text: str  # Improved paragraphs joined with blank lines
+    processed: int  # Paragraphs sent to the model
+    reused: int  # Paragraphs served from the cache
+
+class RewriteBatchItem(TextRewriteRequest):
+    operation: Literal["rewrite"]
+    id: Optional[str] = None  # Echoed back to correlate results
+
+class SummarizeBatchItem(TextSummarizeRequest):
+    operation: Literal["summarize"]
+    id: Optional[str] = None  # Echoed back to correlate results
+
+class BatchRequest(BaseModel):
+    items: List[Annotated[Union[RewriteBatchItem, SummarizeBatchItem], Field(discriminator="operation")]] = Field(
+        ..., min_length=1, max_length=settings.AI_BATCH_MAX_ITEMS
+    )
+
+# Batch items and incrementally improved paragraphs are charged per model call
+# against their own limit, on top of the per-request "ai" limit
+batch_rate_limit = RateLimit("ai_batch", settings.RATE_LIMIT_AI_BATCH)
+
+# Improved paragraphs by (user ID, paragraph hash); kept per user so a hash
+# can't be used to read another user's text. The cache is per worker process:
+# with several workers, a follow-up request that omits text can land on a
+# worker that never saw the paragraph and get a 409, so clients must always
+# handle the 409 by resending the missing paragraphs.
+improved_paragraphs = TTLCache(settings.IMPROVE_CACHE_MAX_ENTRIES, settings.IMPROVE_CACHE_TTL_SECONDS)
+
+def paragraph_hash(text: str) -> str:
+    """Hash a paragraph the same way clients do (hex sha256 of the UTF-8 text)"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def build_improve_prompt(text: str) -> str:
+    return f"Improve the grammar and style of the following text:\n\n{text}\n\nImproved version:"
+
+def build_rewrite_prompt(request: TextRewriteRequest) -> str:
+    prompt = f"Rewrite the following text"
+    
+    if request.style:
+        prompt += f" in a {request.style} style"
+    
+    if request.tone:
+        prompt += f" with a {request.tone} tone"
+        
+    if request.length:
+        prompt += f" and make it {request.length}"
+    
+    return prompt + f":\n\n{request.text}\n\nRewritten text:"
+
+def build_summarize_prompt(request: TextSummarizeRequest) -> str:
+    if request.format == "bullets":
+        format_instruction = "in bullet points"
+    elif request.format == "key_points":
+        format_instruction = "highlighting only the key points"
+    else:
+        format_instruction = "in a concise paragraph"
+    
+    return f"Summarize the following text in about {request.length} sentences {format_instruction}:\n\n{request.text}\n\nSummary:"
+
+async def rewrite(request: TextRewriteRequest) -> Dict[str, str]:
+    return {"rewritten_text": await generate_openai_response(build_rewrite_prompt(request), operation="rewrite")}
+
+async def summarize(request: TextSummarizeRequest) -> Dict[str, str]:
+    return {"summary": await generate_openai_response(build_summarize_prompt(request), operation="summarize")}
+
+BATCH_OPERATIONS = {
+    "rewrite": rewrite,
+    "summarize": summarize,
+}
+
 # OpenAI helper function (placeholder - will implement with actual OpenAI API)
-async def generate_openai_response(prompt: str, max_tokens: int = 500) -> str:
+async def generate_openai_response(prompt: str, max_tokens: int = 500, operation: str = "generate") -> str:
     """Generate text using OpenAI API (placeholder implementation)"""
+    from utils.document_processor import estimate_tokens
+    
+    if settings.LLM_PROVIDER == "stub":
+        return await generate_stub_response(prompt, operation)
+    
     # Check if OpenAI API key is configured
     if not settings.OPENAI_API_KEY:
         raise HTTPException(
@@ -44,9 +150,26 @@ async def generate_openai_response(prompt: str, max_tokens: int = 500) -> str:
             detail="OpenAI API key not configured. Please set OPENAI_API_KEY in environment variables."
         )
     
+    started = time.perf_counter()
+    
     # TODO: Implement actual OpenAI API call
     # For now, return a simple echo response
-    return f"AI response for: {prompt[:50]}... (placeholder)"
+    response = f"AI response for: {prompt[:50]}... (placeholder)"
+    
+    # Token counts are estimated until the API's usage data is available
+    record_llm_call(operation, time.perf_counter() - started, estimate_tokens(prompt), estimate_tokens(response))
+    return response
+
+async def generate_stub_response(prompt: str, operation: str = "generate") -> str:
+    """Local stand-in for the model used in load tests: sleeps for a jittered latency"""
+    from utils.document_processor import estimate_tokens
+    
+    latency = settings.LLM_STUB_LATENCY_MS / 1000 * random.uniform(0.5, 1.5)
+    await asyncio.sleep(latency)
+    
+    response = f"Stub response for: {prompt[:50]}..."
+    record_llm_call(operation, latency, estimate_tokens(prompt), estimate_tokens(response))
+    return response
 
 # Routes with authentication
 @router.post("/improve_text", response_model=TextImprovement)
@@ -56,11 +179,8 @@ async def improve_text(
     current_user: User = Depends(get_current_user)
 ):
     """Improve text grammar and style (requires authentication)"""
-    # Generate prompt for text improvement
-    prompt = f"Improve the grammar and style of the following text:\n\n{text}\n\nImproved version:"
-    
     # Call OpenAI API (placeholder)
-    improved_text = await generate_openai_response(prompt)
+    improved_text = await generate_openai_response(build_improve_prompt(text), operation="improve_text")
     
     # Return response
     return {
@@ -73,32 +193,87 @@ async def improve_text(
         ]
     }
 
-@router.post("/rewrite", response_model=TextRewriteResponse)
-async def rewrite_text(
-    request: TextRewriteRequest,
-    db: Session = Depends(get_db),
+@router.post("/improve_text/incremental", response_model=IncrementalImproveResponse)
+async def improve_text_incremental(
+    request: IncrementalImproveRequest,
     current_user: User = Depends(get_current_user)
 ):
-    """Rewrite text according to specified style and tone (requires authentication)"""
-    # Build prompt based on request parameters
-    prompt = f"Rewrite the following text"
+    """
+    Improve a draft paragraph by paragraph, reusing results for unchanged paragraphs (requires authentication)
     
-    if request.style:
-        prompt += f" in a {request.style} style"
+    Clients send every paragraph's hash and may omit the text of paragraphs they
+    sent before. Only paragraphs not in the cache are sent to the model, concurrently,
+    and each of them is charged against the "ai_batch" rate limit.
+    If an omitted paragraph is not cached (it expired, or another worker served
+    the earlier request), the request fails with 409 and the missing hashes, and
+    the client should resend those paragraphs with text.
+    """
+    results = {}
+    changed = {}
+    missing = []
+    for paragraph in request.paragraphs:
+        if paragraph.hash in results or paragraph.hash in changed:
+            continue
+        if paragraph.text is not None and paragraph_hash(paragraph.text) != paragraph.hash:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"Hash does not match paragraph text: {paragraph.hash}"
+            )
+        cached = improved_paragraphs.get((current_user.id, paragraph.hash))
+        if cached is not None:
+            results[paragraph.hash] = cached
+        elif paragraph.text is not None:
+            changed[paragraph.hash] = paragraph.text
+        else:
+            missing.append(paragraph.hash)
     
-    if request.tone:
-        prompt += f" with a {request.tone} tone"
-        
-    if request.length:
-        prompt += f" and make it {request.length}"
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": "Paragraph text required", "missing_hashes": missing}
+        )
     
-    prompt += f":\n\n{request.text}\n\nRewritten text:"
+    if changed:
+        await run_in_threadpool(batch_rate_limit.enforce, "ai_batch", current_user.id, cost=len(changed))
     
-    # Call OpenAI API (placeholder)
-    rewritten_text = await generate_openai_response(prompt)
+    slots = asyncio.Semaphore(settings.IMPROVE_MAX_CONCURRENCY)
     
-    # Return response
-    return {"rewritten_text": rewritten_text}
+    async def improve_paragraph(text_hash: str, text: str) -> None:
+        async with slots:
+            improved = await generate_openai_response(build_improve_prompt(text), operation="improve_paragraph")
+        results[text_hash] = (text, improved)
+        improved_paragraphs.set((current_user.id, text_hash), (text, improved))
+    
+    await asyncio.gather(*(improve_paragraph(text_hash, text) for text_hash, text in changed.items()))
+    
+    reused = len(request.paragraphs) - len(changed)
+    IMPROVE_PARAGRAPHS.labels("processed").inc(len(changed))
+    IMPROVE_PARAGRAPHS.labels("reused").inc(reused)
+    
+    paragraphs = [
+        {
+            "hash": paragraph.hash,
+            "original_text": results[paragraph.hash][0],
+            "improved_text": results[paragraph.hash][1],
+            "cached": paragraph.hash not in changed
+        }
+        for paragraph in request.paragraphs
+    ]
+    return {
+        "paragraphs": paragraphs,
+        "improved_text": "\n\n".join(paragraph["improved_text"] for paragraph in paragraphs),
+        "processed": len(changed),
+        "reused": reused
+    }
+
+@router.post("/rewrite", response_model=TextRewriteResponse)
+async def rewrite_text(
+    request: TextRewriteRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Rewrite text according to specified style and tone (requires authentication)"""
+    return await rewrite(request)
 
 @router.post("/summarize", response_model=TextSummarizeResponse)
 async def summarize_text(
@@ -107,19 +282,45 @@ async def summarize_text(
     current_user: User = Depends(get_current_user)
 ):
     """Summarize text with AI (requires authentication)"""
-    # Build prompt based on request parameters
-    format_instruction = ""
-    if request.format == "bullets":
-        format_instruction = "in bullet points"
-    elif request.format == "key_points":
-        format_instruction = "highlighting only the key points"
-    else:
-        format_instruction = "in a concise paragraph"
+    return await summarize(request)
+
+@router.post("/batch")
+async def batch(
+    request: BatchRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Run many rewrite/summarize operations in one request (requires authentication)
     
-    prompt = f"Summarize the following text in about {request.length} sentences {format_instruction}:\n\n{request.text}\n\nSummary:"
+    Items are processed concurrently (up to AI_BATCH_MAX_CONCURRENCY at a time)
+    and results are streamed as NDJSON in completion order, one line per item:
+    {"index", "id", "operation", "status": "ok", "result"} or
+    {"index", "id", "operation", "status": "error", "error"}.
+    """
+    await run_in_threadpool(batch_rate_limit.enforce, "ai_batch", current_user.id, cost=len(request.items))
     
-    # Call OpenAI API (placeholder)
-    summary = await generate_openai_response(prompt)
+    slots = asyncio.Semaphore(settings.AI_BATCH_MAX_CONCURRENCY)
     
-    # Return response
-    return {"summary": summary}
+    async def run_item(index: int, item) -> bytes:
+        line = {"index": index, "id": item.id, "operation": item.operation, "status": "ok"}
+        try:
+            async with slots:
+                line["result"] = await BATCH_OPERATIONS[item.operation](item)
+        except HTTPException as e:
+            line.update(status="error", error=e.detail)
+        except Exception as e:
+            logger.error(f"Error in batch item {index} ({item.operation}): {str(e)}")
+            line.update(status="error", error="Internal error")
+        return orjson.dumps(line) + b"\n"
+    
+    async def stream_results():
+        tasks = [asyncio.ensure_future(run_item(index, item)) for index, item in enumerate(request.items)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Stop outstanding upstream calls if the client goes away
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
@@ -1,14 +1,14 @@
 from datetime import timedelta
 from typing import Any, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
 from sqlalchemy.orm import Session
 
 from core.config import settings
 from core.security import create_access_token, verify_password
-from models.base import get_db
+from models.base import SessionLocal, get_db, get_read_db, use_primary, wrote_recently
 from models.user import User
 from schemas.token import Token, TokenPayload
 from schemas.user import UserCreate, User as UserSchema
@@ -21,7 +21,8 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login
 
 
 async def get_current_user(
-    db: Session = Depends(get_db),
+    request: Request,
+    db: Session = Depends(get_read_db),
     token: str = Depends(oauth2_scheme)
 ) -> User:
     """
@@ -44,15 +45,36 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    # Get the user from the database
-    user = db.query(User).filter(User.id == int(token_data.sub)).first()
+    # Get the user from the primary, which may have the account or its last
+    # write before the replicas do
+    with SessionLocal() as primary:
+        user = primary.query(User).filter(User.id == int(token_data.sub)).first()
     if user is None:
         raise credentials_exception
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
+    
+    # Users who just wrote read from the primary, so they see their own changes
+    request.state.user_id = user.id
+    if wrote_recently(user.last_write_at):
+        use_primary(db)
     return user
 
 
+async def get_current_superuser(
+    current_user: User = Depends(get_current_user)
+) -> User:
+    """
+    Get the current user and require admin privileges
+    """
+    if not current_user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required",
+        )
+    return current_user
+
+
 @router.post("/register", response_model=UserSchema, status_code=status.HTTP_201_CREATED)
 async def register_user(
     user_in: UserCreate,
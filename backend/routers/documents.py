@@ -1,37 +1,108 @@
 import os
+import uuid
 import logging
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Header, Query, Response, UploadFile, File, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
-from models.base import get_db
+from core.config import settings
+from core.metrics import INGESTION_CHUNKS, track_stage
+from core.rate_limit import RateLimit
+from models.base import get_db, get_read_db
 from models.document import Document
+from models.document_chunk import DocumentChunk
 from models.user import User
 from routers.auth import get_current_user
-from schemas.document import Document as DocumentSchema, DocumentCreate
+from schemas.document import Document as DocumentSchema, DocumentCreate, DocumentDeleteRequest, DocumentDeleteResponse
+from schemas.document_chunk import DocumentChunk as DocumentChunkSchema, DocumentChunkBatchRequest
+from utils.cache import TTLCache
+from utils.cleanup import purge_documents
+from utils.embeddings import embed_texts
+from utils.etag import etag_matches, make_etag, not_modified, set_etag
+from utils.export import iter_ndjson, iter_zip
+from utils.search import pack_context, search_chunks
+from utils.shards import invalidate_user
 
 # Create router with tags for OpenAPI documentation
 router = APIRouter(tags=["documents"])
 
-# Define schemas for search results
-from pydantic import BaseModel
+# Define schemas for search results and question answering
+from pydantic import BaseModel, Field
 
 class SearchResult(BaseModel):
-    chunk_id: str
+    chunk_id: uuid.UUID
     text: str
-    page_number: int
+    page_number: Optional[int] = None
     relevance_score: float
+    snippet: Optional[str] = None  # HTML-escaped excerpt with <mark> highlights (postgres search backend)
     
     class Config:
         from_attributes = True
 
+class AskRequest(BaseModel):
+    question: str = Field(..., min_length=1, max_length=2000)
+    document_ids: Optional[List[int]] = None  # Defaults to all of the user's documents
+    top_k: int = Field(settings.ASK_TOP_K, ge=1, le=50)
+    context_id: Optional[str] = None  # Answer a follow-up question from an earlier answer's context
+
+class AskCitation(BaseModel):
+    ref: int  # Number used for the source in the answer, e.g. [1]
+    document_id: int
+    document_title: str
+    chunk_id: uuid.UUID
+    page_number: Optional[int] = None
+    section: Optional[str] = None
+    relevance_score: float
+
+class AskResponse(BaseModel):
+    answer: str
+    citations: List[AskCitation]
+    context_id: str  # Pass back with follow-up questions to skip retrieval
+    cached: bool  # Whether the context was reused instead of retrieved
+
+# Packed question-answering contexts by (user ID, context ID), and the context
+# ID of each recent retrieval by (user ID, documents version, backend, question, top_k)
+ask_contexts = TTLCache(settings.ASK_CACHE_MAX_ENTRIES, settings.ASK_CACHE_TTL_SECONDS)
+ask_retrievals = TTLCache(settings.ASK_CACHE_MAX_ENTRIES, settings.ASK_CACHE_TTL_SECONDS)
+
+ASK_PROMPT = (
+    "Answer the question using only the numbered sources below. Cite the sources you use "
+    "with their numbers in square brackets, e.g. [1]. If the sources don't contain the answer, "
+    "say so.\n\nSources:\n{context}\n\nQuestion: {question}\n\nAnswer:"
+)
+
+# Maximum number of characters of document text sent to the model for a summary
+MAX_SUMMARY_INPUT_CHARS = 12000
+
+# Number of chunk rows fetched from the database (and sent) at a time when streaming
+CHUNK_STREAM_BATCH_SIZE = 200
+
+def get_user_document(db: Session, document_id: int, current_user: User) -> Document:
+    """Get a document from the database and verify ownership"""
+    document = Document.query_active(db).filter(Document.id == document_id).first()
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+        
+    if document.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to access this document")
+        
+    return document
+
 # Document routes
-@router.post("/", response_model=DocumentSchema, status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/",
+    response_model=DocumentSchema,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(RateLimit("documents", settings.RATE_LIMIT_UPLOAD))]
+)
 async def upload_document(
     file: UploadFile = File(...),
     title: Optional[str] = None,
@@ -57,101 +128,368 @@ async def upload_document(
     if not title:
         title = os.path.splitext(file.filename)[0]
     
-    # Save file locally
-    from utils.document_processor import save_file_locally, process_document, generate_chunk_id
+    from utils.document_processor import (
+        save_file_locally, extract_pages, chunk_pages, generate_chunk_id, UnsupportedDocumentError
+    )
+    from utils.text_cache import write_page_cache
+    
+    # Extract text before anything is stored, so files that can't be read as
+    # their declared type (e.g. binary content in a .txt) are rejected outright
+    file_type = file_extension.replace(".", "")
+    pages = None
+    try:
+        with track_stage("extract"):
+            pages = extract_pages(file_content, file_type)
+    except UnsupportedDocumentError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error extracting text from document: {str(e)}")
     
     # Create directory for user if it doesn't exist
     user_dir = os.path.join('uploads', str(current_user.id))
     os.makedirs(user_dir, exist_ok=True)
     
     # Save file to storage
-    file_path = save_file_locally(file_content, current_user.id, file.filename)
+    with track_stage("save_file"):
+        file_path = save_file_locally(file_content, current_user.id, file.filename)
     
     # Create document record in database
-    document = Document.create(
-        db=db,
-        title=title,
-        description=description,
-        file_path=file_path,
-        file_type=file_extension.replace(".", ""),
-        file_size=file_size,
-        user_id=current_user.id
-    )
+    with track_stage("create_document"):
+        document = Document.create(
+            db=db,
+            title=title,
+            description=description,
+            file_path=file_path,
+            file_type=file_type,
+            file_size=file_size,
+            user_id=current_user.id
+        )
     
-    # Process document content (extract text and chunk it)
-    try:
-        from models.document_chunk import DocumentChunk
-        
-        # Extract text based on file type
-        file_type = file_extension.replace(".", "")
-        chunks = process_document(file_content, file_type)
-        
-        # Save chunks to database
-        for page_num, chunk_text, chunk_index in chunks:
-            chunk_id = generate_chunk_id()
-            DocumentChunk.create(
-                db=db,
-                document_id=document.id,
-                chunk_id=chunk_id,
-                content=chunk_text,
-                page_number=page_num,
-                chunk_index=chunk_index
-            )
-        
-        # Update document with chunk count
-        document.chunk_count = len(chunks)
-        db.commit()
-        
-    except Exception as e:
-        logger.error(f"Error processing document: {str(e)}")
-        # Continue even if processing fails - we'll still return the document
-        # but it won't have any searchable content
+    # Process document content (cache the extracted text and chunk it).
+    # If extraction failed we still return the document, but it won't have
+    # any searchable content
+    if pages is not None:
+        try:
+            # Cache the extracted text next to the upload, so later operations
+            # don't have to parse the file again
+            with track_stage("cache_text"):
+                write_page_cache(file_path, pages)
+            
+            with track_stage("chunk"):
+                chunks = chunk_pages(
+                    pages,
+                    strategy=settings.CHUNKING_STRATEGY,
+                    max_tokens=settings.CHUNK_MAX_TOKENS,
+                    overlap_tokens=settings.CHUNK_OVERLAP_TOKENS
+                )
+            
+            # Embed the chunks in batches; texts already in the embedding cache
+            # (from any document) are not sent to the embedder again
+            vector_ids = None
+            if settings.EMBEDDINGS_ENABLED:
+                try:
+                    with track_stage("embed"):
+                        vector_ids = await embed_texts(db, [chunk_text for _, chunk_text, _, _ in chunks])
+                except Exception as e:
+                    logger.error(f"Error embedding document {document.id}: {str(e)}")
+            
+            # Save chunks to database in a single insert and update the
+            # document with the chunk count
+            with track_stage("store_chunks"):
+                DocumentChunk.bulk_create(
+                    db=db,
+                    document_id=document.id,
+                    chunks=[
+                        (generate_chunk_id(), chunk_text, page_num, chunk_index, section)
+                        for page_num, chunk_text, chunk_index, section in chunks
+                    ],
+                    vector_ids=vector_ids
+                )
+                document.chunk_count = len(chunks)
+                db.commit()
+            INGESTION_CHUNKS.inc(len(chunks))
+            
+            # The user's search shard no longer covers all their chunks
+            invalidate_user(current_user.id)
+            
+        except Exception as e:
+            logger.error(f"Error processing document: {str(e)}")
     
     return document
 
+@router.post(
+    "/ask",
+    response_model=AskResponse,
+    dependencies=[Depends(RateLimit("documents", settings.RATE_LIMIT_AI))]
+)
+async def ask_documents(
+    request: AskRequest,
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Answer a question from the user's documents, with chunk and page citations (requires authentication)"""
+    from routers.ai import generate_openai_response
+    
+    query = Document.query_active(db).filter(Document.user_id == current_user.id)
+    if request.document_ids is not None:
+        query = query.filter(Document.id.in_(request.document_ids))
+    documents = {document.id: document for document in query.all()}
+    if request.document_ids is not None and len(documents) != len(set(request.document_ids)):
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    # Cached contexts are only valid while the documents and their chunks are unchanged
+    version = make_etag(*((d.id, d.updated_at, d.chunk_count) for d in sorted(documents.values(), key=lambda d: d.id)))
+    
+    context, context_id, cached = None, request.context_id, False
+    if context_id:
+        entry = ask_contexts.get((current_user.id, context_id))
+        if entry is not None and entry[0] == version:
+            context, cached = entry[1], True
+    
+    if context is None:
+        question = " ".join(request.question.lower().split())
+        retrieval_key = (current_user.id, version, settings.SEARCH_BACKEND, question, request.top_k)
+        context_id = ask_retrievals.get(retrieval_key)
+        entry = ask_contexts.get((current_user.id, context_id)) if context_id else None
+        if entry is not None:
+            context, cached = entry[1], True
+        else:
+            hits = await search_chunks(db, list(documents), request.question, request.top_k)
+            context = pack_context(hits, settings.ASK_CONTEXT_MAX_TOKENS)
+            context_id = uuid.uuid4().hex
+            ask_contexts.set((current_user.id, context_id), (version, context))
+            ask_retrievals.set(retrieval_key, context_id)
+    
+    if not context.citations:
+        answer = "I couldn't find anything relevant to this question in the selected documents."
+    else:
+        prompt = ASK_PROMPT.format(context=context.text, question=request.question)
+        answer = await generate_openai_response(prompt, operation="ask")
+    
+    return {
+        "answer": answer,
+        "citations": [
+            {
+                "ref": citation.ref,
+                "document_id": citation.document_id,
+                "document_title": documents[citation.document_id].title,
+                "chunk_id": citation.chunk_id,
+                "page_number": citation.page_number,
+                "section": citation.section,
+                "relevance_score": citation.score
+            }
+            for citation in context.citations
+        ],
+        "context_id": context_id,
+        "cached": cached
+    }
+
+def delete_documents(db: Session, background_tasks: BackgroundTasks, current_user: User,
+                     document_ids: Optional[List[int]] = None) -> dict:
+    """Soft-delete documents now and queue the removal of their chunks and files"""
+    deleted = Document.soft_delete(db, current_user.id, document_ids)
+    if deleted:
+        invalidate_user(current_user.id)
+        background_tasks.add_task(purge_documents, deleted)
+    return {"deleted": len(deleted), "document_ids": deleted}
+
+@router.post("/delete", response_model=DocumentDeleteResponse, status_code=status.HTTP_202_ACCEPTED)
+async def delete_many_documents(
+    request: DocumentDeleteRequest,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Delete many documents at once (requires authentication)"""
+    document_ids = set(request.document_ids)
+    owned = Document.query_active(db, Document.id).filter(
+        Document.user_id == current_user.id, Document.id.in_(document_ids)
+    ).count()
+    if owned != len(document_ids):
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    return delete_documents(db, background_tasks, current_user, list(document_ids))
+
+@router.delete("/", response_model=DocumentDeleteResponse, status_code=status.HTTP_202_ACCEPTED)
+async def delete_all_documents(
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Delete all of the current user's documents (requires authentication)"""
+    return delete_documents(db, background_tasks, current_user)
+
+def document_etag(document: Document) -> str:
+    """ETag of a document's metadata; changes whenever the row is updated"""
+    return make_etag("document", document.id, document.created_at, document.updated_at, document.chunk_count)
+
 @router.get("/", response_model=List[DocumentSchema])
 async def get_user_documents(
-    db: Session = Depends(get_db),
+    response: Response,
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    if_none_match: Optional[str] = Header(None)
 ):
     """Get all documents for the current user (requires authentication)"""
-    documents = db.query(Document).filter(Document.user_id == current_user.id).offset(skip).limit(limit).all()
+    # Version the listing with one aggregate query: any upload, update or
+    # delete changes the count, the newest timestamp or the highest ID
+    count, last_modified, last_id = Document.query_active(
+        db,
+        func.count(Document.id),
+        func.max(func.coalesce(Document.updated_at, Document.created_at)),
+        func.max(Document.id)
+    ).filter(Document.user_id == current_user.id).one()
+    etag = make_etag("documents", current_user.id, skip, limit, count, last_modified, last_id)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    
+    documents = Document.query_active(db).filter(Document.user_id == current_user.id).offset(skip).limit(limit).all()
+    set_etag(response, etag)
     return documents
 
+# Declared before /{document_id}, which would otherwise match "export"
+@router.get(
+    "/export",
+    dependencies=[Depends(RateLimit("documents_export", settings.RATE_LIMIT_EXPORT))]
+)
+async def export_documents(
+    format: Literal["ndjson", "zip"] = "ndjson",
+    include_chunks: bool = True,
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Stream all of the user's documents and chunks as NDJSON, or as a zip with the original files (requires authentication)"""
+    if format == "zip":
+        return StreamingResponse(
+            iter_zip(db, current_user.id, include_chunks),
+            media_type="application/zip",
+            headers={"Content-Disposition": 'attachment; filename="documents-export.zip"'}
+        )
+    return StreamingResponse(
+        iter_ndjson(db, current_user.id, include_chunks),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="documents-export.ndjson"'}
+    )
+
 @router.get("/{document_id}", response_model=DocumentSchema)
 async def get_document(
     document_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    response: Response,
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+    if_none_match: Optional[str] = Header(None)
 ):
     """Get document metadata (requires authentication)"""
-    # Get document from database and verify ownership
-    document = db.query(Document).filter(Document.id == document_id).first()
-    if not document:
-        raise HTTPException(status_code=404, detail="Document not found")
-        
-    if document.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to access this document")
-        
+    document = get_user_document(db, document_id, current_user)
+    etag = document_etag(document)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    
+    set_etag(response, etag)
     return document
 
+@router.delete("/{document_id}", response_model=DocumentDeleteResponse, status_code=status.HTTP_202_ACCEPTED)
+async def delete_document(
+    document_id: int,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Delete a document; its chunks and file are removed in the background (requires authentication)"""
+    get_user_document(db, document_id, current_user)
+    return delete_documents(db, background_tasks, current_user, [document_id])
+
+def stream_chunks(query):
+    """Serialize chunk rows into a JSON array, one batch of rows at a time"""
+    yield "["
+    batch = []
+    first = True
+    for chunk in query.yield_per(CHUNK_STREAM_BATCH_SIZE):
+        batch.append(DocumentChunkSchema.model_validate(chunk).model_dump_json())
+        if len(batch) == CHUNK_STREAM_BATCH_SIZE:
+            yield ("" if first else ",") + ",".join(batch)
+            first = False
+            batch = []
+    if batch:
+        yield ("" if first else ",") + ",".join(batch)
+    yield "]"
+
+@router.get("/{document_id}/chunks", response_model=List[DocumentChunkSchema])
+async def get_document_chunks(
+    document_id: int,
+    first_page: Optional[int] = None,
+    last_page: Optional[int] = None,
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get the chunks of a document, optionally within a page range, in reading order (requires authentication)"""
+    get_user_document(db, document_id, current_user)
+    
+    # Stream the rows so large ranges are never held in memory all at once
+    query = DocumentChunk.query_by_page_range(db, document_id, first_page, last_page)
+    return StreamingResponse(stream_chunks(query), media_type="application/json")
+
+@router.post("/{document_id}/chunks/batch", response_model=List[DocumentChunkSchema])
+async def get_document_chunks_by_id(
+    document_id: int,
+    request: DocumentChunkBatchRequest,
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get many chunks of a document by chunk ID in one query (requires authentication)"""
+    get_user_document(db, document_id, current_user)
+    return DocumentChunk.get_by_chunk_ids(db, document_id, request.chunk_ids)
+
 @router.get("/{document_id}/search", response_model=List[SearchResult])
-async def search_document(document_id: int, query: str):
-    """Search within a document using semantic search"""
-    # Implementation will go here
+async def search_document(
+    document_id: int,
+    query: str,
+    top_k: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Search within a document with the configured search backend (requires authentication)"""
+    get_user_document(db, document_id, current_user)
+    
+    hits = await search_chunks(db, [document_id], query, top_k)
     return [
         {
-            "chunk_id": f"doc_{document_id}_chunk_1",
-            "text": "This is a sample text chunk that matches the query.",
-            "page_number": 1,
-            "relevance_score": 0.95
+            "chunk_id": hit.chunk_id,
+            "text": hit.text,
+            "page_number": hit.page_number,
+            "relevance_score": hit.score,
+            "snippet": hit.snippet
         }
+        for hit in hits
     ]
 
 @router.post("/{document_id}/summarize")
-async def summarize_document(document_id: int):
-    """Generate an AI summary of the document"""
-    # Implementation will go here
-    return {"summary": "This is a placeholder for the document summary."}
+async def summarize_document(
+    document_id: int,
+    first_page: Optional[int] = None,
+    last_page: Optional[int] = None,
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Generate an AI summary of the document or a page range of it (requires authentication)"""
+    from routers.ai import generate_openai_response
+    from utils.text_cache import get_document_pages
+    
+    document = get_user_document(db, document_id, current_user)
+    
+    # Read page text from the cache; the file is only parsed again on a cache miss
+    try:
+        pages = await run_in_threadpool(
+            get_document_pages, document.file_path, document.file_type, first_page, last_page
+        )
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Document file not found")
+    
+    text = "\n\n".join(segment.text for segment in pages)
+    prompt = f"Summarize the following document:\n\n{text[:MAX_SUMMARY_INPUT_CHARS]}\n\nSummary:"
+    
+    summary = await generate_openai_response(prompt, operation="summarize_document")
+    
+    return {"summary": summary}
@@ -0,0 +1,36 @@
+import os
+from typing import Any, List
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+
+from core.profiling import list_profiles, profile_path
+from models.user import User
+from routers.auth import get_current_superuser
+
+# Create router with tags for OpenAPI documentation
+router = APIRouter(tags=["profiles"])
+
+
+@router.get("/")
+async def get_profiles(
+    current_user: User = Depends(get_current_superuser)
+) -> List[Any]:
+    """
+    List captured request profiles, newest first (requires admin)
+    """
+    return list_profiles()
+
+
+@router.get("/{profile_id}")
+async def download_profile(
+    profile_id: str,
+    current_user: User = Depends(get_current_superuser)
+):
+    """
+    Download a request profile as folded stacks for flamegraph tools (requires admin)
+    """
+    path = profile_path(profile_id)
+    if path is None or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=f"profile-{profile_id}.folded")
@@ -1,6 +1,6 @@
 from datetime import datetime
-from typing import Optional
-from pydantic import BaseModel
+from typing import List, Optional
+from pydantic import BaseModel, Field
 
 
 class DocumentBase(BaseModel):
@@ -38,3 +38,14 @@ class DocumentInDBBase(DocumentBase):
 class Document(DocumentInDBBase):
     """Model for document response data"""
     pass
+
+
+class DocumentDeleteRequest(BaseModel):
+    """Model for deleting many documents in one request"""
+    document_ids: List[int] = Field(..., min_length=1, max_length=1000)
+
+
+class DocumentDeleteResponse(BaseModel):
+    """Model for the documents a delete request removed"""
+    deleted: int
+    document_ids: List[int]
@@ -1,12 +1,14 @@
-from pydantic import BaseModel
-from typing import Optional
+from uuid import UUID
+from pydantic import BaseModel, Field
+from typing import List, Optional
 
 class DocumentChunkBase(BaseModel):
     """Base model for document chunk data"""
-    chunk_id: str
+    chunk_id: UUID
     content: str
     page_number: Optional[int] = None
     chunk_index: int
+    section: Optional[str] = None
 
 class DocumentChunkCreate(DocumentChunkBase):
     """Model for creating a new document chunk"""
@@ -25,3 +27,7 @@ class DocumentChunkInDB(DocumentChunkBase):
 class DocumentChunk(DocumentChunkInDB):
     """Model for document chunk response data"""
     pass
+
+class DocumentChunkBatchRequest(BaseModel):
+    """Model for fetching many chunks of a document by chunk ID"""
+    chunk_ids: List[UUID] = Field(..., min_length=1, max_length=500)
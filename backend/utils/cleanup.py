@@ -0,0 +1,120 @@
+"""Background cleanup of deleted documents
+
+Deleting a document only sets Document.deleted_at, which hides it from
+listings, search and question answering right away. The data is removed
+afterwards by purge_documents, usually as a BackgroundTasks job of the delete
+request:
+
+    1. chunk rows, CLEANUP_CHUNK_BATCH_SIZE at a time, one short transaction each
+    2. the uploaded file and its page text cache sidecar (`<file_path>.pages`)
+    3. the document row itself
+
+Embedding cache entries are keyed by content hash and shared across documents,
+so they are kept. If a worker stops before its cleanup job finished, the
+leftover documents can be purged with:
+
+    python -m utils.cleanup
+"""
+import logging
+import os
+import sys
+from typing import Iterable, List, Optional
+
+from core.config import settings
+from models.base import SessionLocal
+from models.document import Document
+from models.document_chunk import DocumentChunk
+from utils.text_cache import cache_path
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+def remove_file(path: str) -> bool:
+    """
+    Remove a file, returning False if it did not exist
+    """
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def purge_document(db, document: Document, batch_size: int) -> int:
+    """
+    Remove a deleted document's chunks, files and row, returning the number of chunks removed
+    """
+    removed = 0
+    while True:
+        count = DocumentChunk.delete_batch(db, document.id, batch_size)
+        db.commit()
+        removed += count
+        if count < batch_size:
+            break
+
+    # Uploads with the same file name share a path; keep the file while another document uses it
+    shared = db.query(Document.id).filter(Document.file_path == document.file_path, Document.id != document.id).first()
+    if shared is None:
+        remove_file(document.file_path)
+        remove_file(cache_path(document.file_path))
+
+    db.query(Document).filter(Document.id == document.id).delete(synchronize_session=False)
+    db.commit()
+    return removed
+
+
+def purge_documents(document_ids: Iterable[int], batch_size: Optional[int] = None) -> int:
+    """
+    Remove the data of soft-deleted documents
+
+    Documents that were not marked as deleted are skipped. Failures are logged
+    and leave the document marked as deleted, so a later run can retry it.
+
+    Args:
+        document_ids (Iterable[int]): IDs of deleted documents
+        batch_size (Optional[int]): Chunk rows deleted per transaction (defaults to CLEANUP_CHUNK_BATCH_SIZE)
+
+    Returns:
+        int: Number of documents purged
+    """
+    batch_size = batch_size or settings.CLEANUP_CHUNK_BATCH_SIZE
+    purged = 0
+    db = SessionLocal()
+    try:
+        for document_id in document_ids:
+            document = db.query(Document).filter(
+                Document.id == document_id, Document.deleted_at.isnot(None)
+            ).first()
+            if document is None:
+                continue
+            try:
+                chunks = purge_document(db, document, batch_size)
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Error purging document {document_id}: {str(e)}")
+                continue
+            purged += 1
+            logger.info(f"Purged document {document_id} ({chunks} chunks)")
+    finally:
+        db.close()
+    return purged
+
+
+def pending_document_ids(batch_size: int = 500) -> List[int]:
+    """
+    Get the IDs of all documents marked as deleted
+    """
+    db = SessionLocal()
+    try:
+        rows = db.query(Document.id).filter(Document.deleted_at.isnot(None)).order_by(Document.id)
+        return [row.id for row in rows.yield_per(batch_size)]
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    pending = pending_document_ids()
+    logger.info(f"Purging {len(pending)} deleted documents")
+    sys.exit(0 if purge_documents(pending) == len(pending) else 1)
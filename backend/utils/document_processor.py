@@ -1,14 +1,47 @@
 """Document processing utilities for text extraction and chunking"""
 import os
+import re
+import time
 import uuid
 import logging
-import pypdf
-from typing import List, Tuple, Optional
+import threading
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import Callable, Dict, Iterator, List, NamedTuple, Tuple, Optional
 from io import BytesIO
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+class TextSegment(NamedTuple):
+    """A run of extracted text that belongs to a single page and section"""
+    page_number: int
+    text: str
+    section: Optional[str] = None
+
+class UnsupportedDocumentError(ValueError):
+    """Raised when a file can't be turned into text (unknown type or binary content)"""
+    pass
+
+# Registry of text extractors keyed by file type (file extension without the dot)
+EXTRACTORS: Dict[str, Callable[[bytes], List[TextSegment]]] = {}
+
+# Separator used to join nested section headings into a section path
+SECTION_SEPARATOR = " > "
+
+def register_extractor(*file_types: str):
+    """
+    Decorator that registers a text extractor for one or more file types
+    
+    Args:
+        file_types (str): File types handled by the extractor (e.g. "pdf", "md")
+    """
+    def decorator(func):
+        for file_type in file_types:
+            EXTRACTORS[file_type] = func
+        return func
+    return decorator
+
 def extract_text_from_pdf(file_content: bytes) -> List[Tuple[int, str]]:
     """
     Extract text from a PDF file
@@ -19,6 +52,9 @@ def extract_text_from_pdf(file_content: bytes) -> List[Tuple[int, str]]:
     Returns:
         List[Tuple[int, str]]: List of tuples containing page number and page text
     """
+    # pypdf is slow to import, so only load it in processes that parse PDFs
+    import pypdf
+    
     try:
         pdf = pypdf.PdfReader(BytesIO(file_content))
         pages = []
@@ -35,6 +71,166 @@ def extract_text_from_pdf(file_content: bytes) -> List[Tuple[int, str]]:
         logger.error(f"Error extracting text from PDF: {str(e)}")
         raise e
 
+@register_extractor("pdf")
+def extract_pdf(file_content: bytes) -> List[TextSegment]:
+    """Extract one segment per PDF page"""
+    return [TextSegment(page_num, text) for page_num, text in extract_text_from_pdf(file_content)]
+
+def _decode_text(file_content: bytes) -> str:
+    """
+    Decode a plain text file, rejecting content that is clearly binary
+    """
+    sample = file_content[:8192]
+    if b"\x00" in sample:
+        raise UnsupportedDocumentError("File appears to be binary, not text")
+    
+    text = file_content.decode('utf-8', errors='ignore')
+    
+    # Bytes that aren't valid UTF-8 are dropped above; if most of the sample
+    # disappeared or is made of control characters, this isn't a text file
+    decoded_sample = sample.decode('utf-8', errors='ignore')
+    control_chars = sum(1 for c in decoded_sample if ord(c) < 32 and c not in "\n\r\t\f")
+    if sample and (len(decoded_sample.encode('utf-8')) < len(sample) * 0.7
+                   or control_chars > len(decoded_sample) * 0.1):
+        raise UnsupportedDocumentError("File appears to be binary, not text")
+    
+    return text
+
+@register_extractor("txt")
+def extract_plain_text(file_content: bytes) -> List[TextSegment]:
+    """Extract a plain text file as a single page"""
+    return [TextSegment(1, _decode_text(file_content))]
+
+_MD_HEADING = re.compile(r"^ {0,3}(#{1,6})[ \t]+(.*?)[ \t#]*$")
+_MD_FENCE = re.compile(r"^ {0,3}(```|~~~)")
+
+@register_extractor("md")
+def extract_markdown(file_content: bytes) -> List[TextSegment]:
+    """
+    Extract a Markdown file as one segment per section
+    
+    Sections start at ATX headings (`#` to `######`); each segment records the
+    path of headings it is nested under. Headings inside fenced code blocks
+    are treated as text.
+    """
+    text = _decode_text(file_content)
+    segments = []
+    headings: List[Tuple[int, str]] = []
+    lines: List[str] = []
+    in_fence = False
+    
+    def flush():
+        body = "".join(lines)
+        if body.strip():
+            section = SECTION_SEPARATOR.join(title for _, title in headings) or None
+            segments.append(TextSegment(1, body, section))
+        lines.clear()
+    
+    for line in text.splitlines(keepends=True):
+        if _MD_FENCE.match(line):
+            in_fence = not in_fence
+        match = None if in_fence else _MD_HEADING.match(line.rstrip("\r\n"))
+        if match:
+            flush()
+            level = len(match.group(1))
+            while headings and headings[-1][0] >= level:
+                headings.pop()
+            headings.append((level, match.group(2)))
+        lines.append(line)
+    flush()
+    
+    return segments
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+def _iter_docx_paragraphs(file_content: bytes) -> Iterator[Tuple[str, Optional[str], bool]]:
+    """
+    Stream paragraphs from word/document.xml
+    
+    Yields:
+        Tuple[str, Optional[str], bool]: Paragraph text, paragraph style and whether
+        a page break occurs before the paragraph
+    """
+    try:
+        archive = zipfile.ZipFile(BytesIO(file_content))
+        xml_file = archive.open("word/document.xml")
+    except (zipfile.BadZipFile, KeyError):
+        raise UnsupportedDocumentError("File is not a valid DOCX document")
+    
+    with archive, xml_file:
+        parts: List[str] = []
+        style = None
+        page_break = False
+        # An explicit page break ends the page after the paragraph that contains it
+        break_after = False
+        
+        for event, elem in ET.iterparse(xml_file, events=("start", "end")):
+            tag = elem.tag
+            if event == "start":
+                if tag == f"{_W}p":
+                    parts, style = [], None
+                    page_break, break_after = break_after, False
+                continue
+            
+            if tag == f"{_W}t":
+                parts.append(elem.text or "")
+            elif tag == f"{_W}tab":
+                parts.append("\t")
+            elif tag == f"{_W}br":
+                if elem.get(f"{_W}type") == "page":
+                    break_after = True
+                else:
+                    parts.append("\n")
+            elif tag in (f"{_W}lastRenderedPageBreak", f"{_W}pageBreakBefore"):
+                page_break = True
+            elif tag == f"{_W}pStyle":
+                style = elem.get(f"{_W}val")
+            elif tag == f"{_W}p":
+                yield "".join(parts), style, page_break
+                # Free the parsed subtree; a paragraph is never needed again
+                elem.clear()
+
+@register_extractor("docx")
+def extract_docx(file_content: bytes) -> List[TextSegment]:
+    """
+    Extract a DOCX file as segments split at page breaks and headings
+    
+    Page numbers follow explicit and last-rendered page breaks in the document,
+    and sections follow paragraphs styled as "Title" or "Heading N".
+    """
+    segments = []
+    headings: List[Tuple[int, str]] = []
+    paragraphs: List[str] = []
+    page_num = 1
+    
+    def flush():
+        body = "\n".join(paragraphs)
+        if body.strip():
+            section = SECTION_SEPARATOR.join(title for _, title in headings) or None
+            segments.append(TextSegment(page_num, body, section))
+        paragraphs.clear()
+    
+    for text, style, page_break in _iter_docx_paragraphs(file_content):
+        if page_break:
+            flush()
+            page_num += 1
+        
+        level = None
+        if style == "Title":
+            level = 0
+        elif style and style.startswith("Heading") and style[7:].isdigit():
+            level = int(style[7:])
+        
+        if level is not None and text.strip():
+            flush()
+            while headings and headings[-1][0] >= level:
+                headings.pop()
+            headings.append((level, text.strip()))
+        paragraphs.append(text)
+    flush()
+    
+    return segments
+
 def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
     """
     Split text into chunks with overlap
@@ -73,42 +269,233 @@ def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[st
             
     return chunks
 
-def process_document(file_content: bytes, file_type: str, 
-                    chunk_size: int = 1000, overlap: int = 200) -> List[Tuple[int, str, int]]:
+class Chunk(NamedTuple):
     """
-    Process document content into chunks
+    A chunk produced by the semantic chunker, with its position in the source text
+
+    The offsets are relative to the text passed to chunk_text_semantic. chunk_pages
+    does not pass them on, so they are not stored with DocumentChunk rows.
+    """
+    text: str
+    start: int  # Offset of the first character in the source text
+    end: int  # Offset one past the last character in the source text
+    section: Optional[str] = None
+
+_TOKEN = re.compile(r"\w{1,8}|[^\w\s]")
+_PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n\s*")
+_SENTENCE_END = re.compile(r"(?<=[.!?])[\"')\]]*\s+(?=[\"'(\[]*[A-Z0-9])")
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of model tokens in a text
+    
+    Counts words (long words as one token per 8 characters) and punctuation
+    marks, which tracks BPE token counts closely enough for packing chunks
+    without loading a tokenizer.
+    """
+    return len(_TOKEN.findall(text))
+
+def _split_spans(text: str, pattern: re.Pattern, start: int, end: int) -> List[Tuple[int, int]]:
+    """Split text[start:end] at the matches of a separator pattern into (start, end) spans"""
+    spans = []
+    pos = start
+    for match in pattern.finditer(text, start, end):
+        if match.start() > pos:
+            spans.append((pos, match.start()))
+        pos = match.end()
+    if end > pos:
+        spans.append((pos, end))
+    return spans
+
+def _split_to_budget(text: str, start: int, end: int, max_tokens: int) -> List[Tuple[int, int]]:
+    """
+    Break a span that doesn't fit the token budget into sentences, falling back
+    to runs of words for sentences that are still too long
+    """
+    # No single character counts as more than one token, so capping words at
+    # max_tokens characters guarantees every word fits the budget
+    word_pattern = re.compile(rf"\S{{1,{max_tokens}}}")
+    units = []
+    for sent_start, sent_end in _split_spans(text, _SENTENCE_END, start, end):
+        if estimate_tokens(text[sent_start:sent_end]) <= max_tokens:
+            units.append((sent_start, sent_end))
+            continue
+        run_start, run_tokens, run_end = None, 0, sent_start
+        for word in word_pattern.finditer(text, sent_start, sent_end):
+            word_tokens = estimate_tokens(word.group())
+            if run_start is not None and run_tokens + word_tokens > max_tokens:
+                units.append((run_start, run_end))
+                run_start, run_tokens = None, 0
+            if run_start is None:
+                run_start = word.start()
+            run_tokens += word_tokens
+            run_end = word.end()
+        if run_start is not None:
+            units.append((run_start, run_end))
+    return units
+
+def chunk_text_semantic(text: str, max_tokens: int = 256, overlap_tokens: int = 32,
+                        section: Optional[str] = None) -> List[Chunk]:
+    """
+    Split text into chunks along headings, paragraphs and sentences
+    
+    Paragraphs are packed into chunks of up to max_tokens; a paragraph that is
+    too long on its own is split into sentences. Chunks never cross a Markdown
+    heading, and each chunk records the heading path it falls under. Up to
+    overlap_tokens of trailing sentences/paragraphs are repeated at the start
+    of the next chunk in the same section.
+    
+    Args:
+        text (str): Text to split
+        max_tokens (int): Token budget per chunk, as counted by estimate_tokens
+        overlap_tokens (int): Maximum number of tokens repeated between chunks
+        section (Optional[str]): Section path the text belongs to
+        
+    Returns:
+        List[Chunk]: Chunks with their offsets in text and section path
+    """
+    chunks = []
+    headings: List[Tuple[int, str]] = []
+    units: List[Tuple[int, int, int]] = []  # (start, end, tokens) of the chunk being packed
+    packed_tokens = 0
+    
+    def current_section() -> Optional[str]:
+        path = [section] if section else []
+        path.extend(title for _, title in headings)
+        return SECTION_SEPARATOR.join(path) or None
+    
+    def emit(keep_overlap: bool):
+        nonlocal units, packed_tokens
+        if not units:
+            return
+        start, end = units[0][0], units[-1][1]
+        chunks.append(Chunk(text[start:end], start, end, current_section()))
+        
+        # Carry trailing units over as overlap, as long as they fit the overlap budget
+        carried, carried_tokens = [], 0
+        if keep_overlap:
+            for unit in reversed(units[1:]):
+                if carried_tokens + unit[2] > overlap_tokens:
+                    break
+                carried.insert(0, unit)
+                carried_tokens += unit[2]
+        units, packed_tokens = carried, carried_tokens
+    
+    def add(start: int, end: int, tokens: int):
+        nonlocal packed_tokens
+        if units and packed_tokens + tokens > max_tokens:
+            emit(keep_overlap=True)
+            # Drop the overlap if it would push the new unit over budget
+            if packed_tokens + tokens > max_tokens:
+                units.clear()
+                packed_tokens = 0
+        units.append((start, end, tokens))
+        packed_tokens += tokens
+    
+    for block_start, block_end in _split_spans(text, _PARAGRAPH_BREAK, 0, len(text)):
+        block = text[block_start:block_end]
+        heading = _MD_HEADING.match(block.split("\n", 1)[0])
+        # A segment from extract_pages starts with its own heading, which `section` already names
+        own_heading = heading and block_start == 0 and section \
+            and section.split(SECTION_SEPARATOR)[-1] == heading.group(2)
+        if heading and not own_heading:
+            # A heading closes the current chunk and opens a new section
+            emit(keep_overlap=False)
+            level = len(heading.group(1))
+            while headings and headings[-1][0] >= level:
+                headings.pop()
+            headings.append((level, heading.group(2)))
+        
+        tokens = estimate_tokens(block)
+        if tokens <= max_tokens:
+            add(block_start, block_end, tokens)
+            continue
+        for unit_start, unit_end in _split_to_budget(text, block_start, block_end, max_tokens):
+            add(unit_start, unit_end, estimate_tokens(text[unit_start:unit_end]))
+    emit(keep_overlap=False)
+    
+    return chunks
+
+def extract_pages(file_content: bytes, file_type: str) -> List[TextSegment]:
+    """
+    Extract the text of a document using the extractor registered for its type
     
     Args:
         file_content (bytes): Content of the file
-        file_type (str): Type of the file (pdf, txt, etc.)
-        chunk_size (int): Size of each chunk
-        overlap (int): Overlap between chunks
+        file_type (str): Type of the file (pdf, txt, md, docx)
         
     Returns:
-        List[Tuple[int, str, int]]: List of tuples containing (page number, text chunk, chunk index)
+        List[TextSegment]: Segments of text with their page number and section path
+        
+    Raises:
+        UnsupportedDocumentError: If there is no extractor for the file type or the
+        content can't be read as that type
+    """
+    extractor = EXTRACTORS.get(file_type)
+    if extractor is None:
+        raise UnsupportedDocumentError(f"No text extractor for file type: {file_type}")
+    return extractor(file_content)
+
+def chunk_pages(pages: List[TextSegment], 
+                chunk_size: int = 1000, overlap: int = 200,
+                strategy: str = "fixed", max_tokens: int = 256,
+                overlap_tokens: int = 32) -> List[Tuple[int, str, int, Optional[str]]]:
     """
+    Split extracted segments into chunks
+    
+    Chunks never span segments, so every chunk belongs to exactly one page and section.
+    
+    Args:
+        pages (List[TextSegment]): Segments as returned by extract_pages
+        chunk_size (int): Size of each chunk ("fixed" strategy)
+        overlap (int): Overlap between chunks ("fixed" strategy)
+        strategy (str): "fixed" for character-based chunks (chunk_text) or
+            "semantic" for structure-aware chunks (chunk_text_semantic)
+        max_tokens (int): Token budget per chunk ("semantic" strategy)
+        overlap_tokens (int): Overlap between chunks in tokens ("semantic" strategy)
+        
+    Returns:
+        List[Tuple[int, str, int, Optional[str]]]: List of tuples containing
+        (page number, text chunk, chunk index, section path)
+    """
+    if strategy not in ("fixed", "semantic"):
+        raise ValueError(f"Unknown chunking strategy: {strategy}")
+    
     chunks = []
+    chunk_index = 0
     
-    if file_type == 'pdf':
-        pages = extract_text_from_pdf(file_content)
-        chunk_index = 0
-        
-        for page_num, page_text in pages:
-            page_chunks = chunk_text(page_text, chunk_size, overlap)
-            for chunk in page_chunks:
-                if chunk.strip():  # Only include non-empty chunks
-                    chunks.append((page_num, chunk, chunk_index))
-                    chunk_index += 1
-    else:
-        # For text files, treat as a single page
-        text = file_content.decode('utf-8', errors='ignore')
-        page_chunks = chunk_text(text, chunk_size, overlap)
-        for i, chunk in enumerate(page_chunks):
+    for page_num, page_text, section in pages:
+        if strategy == "semantic":
+            page_chunks = [
+                (chunk.text, chunk.section)
+                for chunk in chunk_text_semantic(page_text, max_tokens, overlap_tokens, section)
+            ]
+        else:
+            page_chunks = [(chunk, section) for chunk in chunk_text(page_text, chunk_size, overlap)]
+        for chunk, chunk_section in page_chunks:
             if chunk.strip():  # Only include non-empty chunks
-                chunks.append((1, chunk, i))  # Page 1 for text files
+                chunks.append((page_num, chunk, chunk_index, chunk_section))
+                chunk_index += 1
                 
     return chunks
 
+def process_document(file_content: bytes, file_type: str, 
+                    chunk_size: int = 1000, overlap: int = 200) -> List[Tuple[int, str, int, Optional[str]]]:
+    """
+    Process document content into chunks
+    
+    Args:
+        file_content (bytes): Content of the file
+        file_type (str): Type of the file (pdf, txt, md, docx)
+        chunk_size (int): Size of each chunk
+        overlap (int): Overlap between chunks
+        
+    Returns:
+        List[Tuple[int, str, int, Optional[str]]]: List of tuples containing
+        (page number, text chunk, chunk index, section path)
+    """
+    return chunk_pages(extract_pages(file_content, file_type), chunk_size, overlap)
+
 def save_file_locally(file_content: bytes, user_id: int, filename: str) -> str:
     """
     Save file to local storage
@@ -132,11 +519,44 @@ def save_file_locally(file_content: bytes, user_id: int, filename: str) -> str:
         
     return file_path
 
-def generate_chunk_id() -> str:
+# Last (timestamp, counter) handed out by uuid7, so IDs from this process stay ordered
+_uuid7_lock = threading.Lock()
+_uuid7_state = (0, 0)
+
+def uuid7() -> uuid.UUID:
+    """
+    Generate a time-ordered UUID (version 7, RFC 9562)
+    
+    The first 48 bits are the Unix time in milliseconds, so new IDs land at
+    the right-hand edge of a B-tree index instead of on random pages. IDs
+    generated within the same millisecond use an incrementing 12-bit counter
+    (seeded randomly) and stay ordered; the last 62 bits are random.
+    
+    Returns:
+        uuid.UUID: Version 7 UUID
+    """
+    global _uuid7_state
+    with _uuid7_lock:
+        timestamp_ms = time.time_ns() // 1_000_000
+        last_ms, counter = _uuid7_state
+        if timestamp_ms <= last_ms:
+            # Same millisecond (or the clock went back): keep counting from the last ID
+            timestamp_ms, counter = last_ms, counter + 1
+            if counter > 0xFFF:
+                timestamp_ms, counter = last_ms + 1, 0
+        else:
+            # Leave headroom in the counter for IDs generated in the same millisecond
+            counter = int.from_bytes(os.urandom(2), "big") & 0x7FF
+        _uuid7_state = (timestamp_ms, counter)
+    
+    rand_b = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+    return uuid.UUID(int=(timestamp_ms << 80) | (0x7 << 76) | (counter << 64) | (0b10 << 62) | rand_b)
+
+def generate_chunk_id() -> uuid.UUID:
     """
-    Generate a unique ID for a chunk
+    Generate a unique, time-ordered ID for a chunk
     
     Returns:
-        str: Unique ID
+        uuid.UUID: Version 7 UUID (stored in a native UUID column)
     """
-    return str(uuid.uuid4())
+    return uuid7()
@@ -0,0 +1,195 @@
+"""Batched chunk embedding with a persistent content-hash cache
+
+Chunk texts are normalized and hashed together with the model name; the hash
+is the chunk's vector ID and the key of its vector in the embedding_cache
+table, so identical chunks (license text, repeated headers, re-uploads) are
+embedded once across all documents and users. Texts missing from the cache
+are deduplicated, split into batches of EMBEDDING_BATCH_SIZE and sent to the
+configured embedder, with at most EMBEDDING_MAX_CONCURRENCY requests in
+flight.
+"""
+import asyncio
+import hashlib
+import logging
+import re
+import struct
+import time
+import unicodedata
+from array import array
+from typing import Dict, List, Optional, Sequence
+
+from core.config import settings
+from core.metrics import EMBEDDING_BATCH_LATENCY, EMBEDDING_CACHE_LOOKUPS
+from models.embedding import EmbeddingCache
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+EMBEDDERS: Dict[str, type] = {}
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def register_embedder(name: str):
+    """
+    Decorator that registers an embedder class under an EMBEDDING_PROVIDER name
+    """
+    def decorator(cls):
+        cls.provider = name
+        EMBEDDERS[name] = cls
+        return cls
+    return decorator
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize chunk text so trivially different copies share a cache entry
+    """
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def content_hash(text: str, model: str) -> str:
+    """
+    Get the cache key (and vector ID) of a chunk text for a model
+
+    Args:
+        text (str): Chunk text
+        model (str): Embedding model name
+
+    Returns:
+        str: Hex sha256 of the model name and the normalized text
+    """
+    return hashlib.sha256(f"{model}\n{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+def pack_vector(vector: Sequence[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def unpack_vector(data: bytes) -> List[float]:
+    vector = array("f")
+    vector.frombytes(data)
+    return vector.tolist()
+
+
+@register_embedder("openai")
+class OpenAIEmbedder:
+    """
+    Embeddings from the OpenAI API
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self._client = None
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        if not settings.OPENAI_API_KEY:
+            raise RuntimeError("OpenAI API key not configured. Please set OPENAI_API_KEY in environment variables.")
+        if self._client is None:
+            from openai import AsyncOpenAI
+
+            self._client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        response = await self._client.embeddings.create(model=self.model, input=texts)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+
+@register_embedder("stub")
+class HashEmbedder:
+    """
+    Deterministic local embedder for development and load tests (no network)
+
+    Vectors are derived from the text's hash, so equal texts get equal
+    vectors but similarity carries no meaning.
+    """
+
+    def __init__(self, model: str, dimensions: Optional[int] = None):
+        self.model = model
+        self.dimensions = dimensions or settings.EMBEDDING_DIMENSIONS
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        return [self._vector(text) for text in texts]
+
+    def _vector(self, text: str) -> List[float]:
+        seed = hashlib.sha256(text.encode("utf-8")).digest()
+        values = []
+        counter = 0
+        while len(values) < self.dimensions:
+            block = hashlib.sha256(seed + struct.pack(">I", counter)).digest()
+            values.extend(byte / 127.5 - 1 for byte in block)
+            counter += 1
+        return values[:self.dimensions]
+
+
+def get_embedder(provider: Optional[str] = None, model: Optional[str] = None):
+    """
+    Create the embedder configured by EMBEDDING_PROVIDER and EMBEDDING_MODEL
+    """
+    provider = provider or settings.EMBEDDING_PROVIDER
+    try:
+        embedder_class = EMBEDDERS[provider]
+    except KeyError:
+        raise ValueError(f"Unknown embedding provider: {provider}")
+    return embedder_class(model or settings.EMBEDDING_MODEL)
+
+
+async def embed_texts(db, texts: Sequence[str], embedder=None, batch_size: Optional[int] = None,
+                      max_concurrency: Optional[int] = None) -> List[str]:
+    """
+    Make sure every text has a cached embedding and return their vector IDs
+
+    Args:
+        db: SQLAlchemy session used to read and fill the embedding cache
+        texts (Sequence[str]): Chunk texts
+        embedder: Embedder to use (defaults to get_embedder())
+        batch_size (Optional[int]): Texts per embedding request
+        max_concurrency (Optional[int]): Maximum embedding requests in flight
+
+    Returns:
+        List[str]: Content hash of each text, in input order
+    """
+    embedder = embedder or get_embedder()
+    batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+    max_concurrency = max_concurrency or settings.EMBEDDING_MAX_CONCURRENCY
+
+    hashes = [content_hash(text, embedder.model) for text in texts]
+
+    # Deduplicate first, so repeated chunks in one document are looked up and embedded once
+    unique: Dict[str, str] = {}
+    for text, text_hash in zip(texts, hashes):
+        unique.setdefault(text_hash, text)
+
+    cached = EmbeddingCache.get_existing(db, unique)
+    missing = [(text_hash, text) for text_hash, text in unique.items() if text_hash not in cached]
+    EMBEDDING_CACHE_LOOKUPS.labels("hit").inc(len(unique) - len(missing))
+    EMBEDDING_CACHE_LOOKUPS.labels("miss").inc(len(missing))
+    if not missing:
+        return hashes
+
+    slots = asyncio.Semaphore(max_concurrency)
+
+    async def embed_batch(batch):
+        async with slots:
+            started = time.perf_counter()
+            vectors = await embedder.embed([normalize_text(text) for _, text in batch])
+            EMBEDDING_BATCH_LATENCY.labels(embedder.provider).observe(time.perf_counter() - started)
+        return [
+            {"content_hash": text_hash, "model": embedder.model, "dimensions": len(vector),
+             "vector": pack_vector(vector)}
+            for (text_hash, _), vector in zip(batch, vectors)
+        ]
+
+    batches = [missing[start:start + batch_size] for start in range(0, len(missing), batch_size)]
+    results = await asyncio.gather(*(embed_batch(batch) for batch in batches))
+
+    EmbeddingCache.put_many(db, [row for rows in results for row in rows])
+    db.commit()
+    logger.info(f"Embedded {len(missing)} of {len(texts)} chunks in {len(batches)} batches")
+
+    return hashes
+
+
+def get_vectors(db, vector_ids: Sequence[str]) -> Dict[str, List[float]]:
+    """
+    Load cached embedding vectors by vector ID
+    """
+    return {vector_id: unpack_vector(data) for vector_id, data in EmbeddingCache.get_many(db, vector_ids).items()}
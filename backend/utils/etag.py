@@ -0,0 +1,63 @@
+"""ETag helpers for conditional GET requests
+
+Endpoints derive a weak ETag from cheap metadata (IDs, timestamps, counts)
+before loading or serializing anything, and return 304 Not Modified when
+the client's If-None-Match header already carries it.
+"""
+import hashlib
+from typing import Optional
+
+from fastapi import Response, status
+
+# Cached responses must be revalidated, and only by the user who fetched them
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """
+    Build a weak ETag from the values a response depends on
+
+    Args:
+        *parts: Values identifying the response version (IDs, timestamps, counts, ...)
+
+    Returns:
+        str: Quoted weak ETag, e.g. W/"3f2a..."
+    """
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+    return f'W/"{digest[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an If-None-Match header against an ETag (weak comparison)
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    """
+    Build an empty 304 response for a matching ETag
+    """
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": CACHE_CONTROL},
+    )
+
+
+def set_etag(response: Response, etag: str) -> None:
+    """
+    Attach an ETag and revalidation headers to a full response
+    """
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
@@ -0,0 +1,159 @@
+"""Streaming export of a user's documents and chunks
+
+The export is NDJSON, one object per line:
+
+    {"type": "document", "data": {...document metadata...}}
+    {"type": "chunk", "data": {...chunk...}}    (the document's chunks in reading order)
+
+or a zip archive holding that NDJSON as `documents.ndjson` plus the original
+uploads under `files/<document_id>/<file name>`. Rows are read with yield_per
+(server-side cursors on Postgres) and the zip is written to an in-memory sink
+that is drained after every block, so memory use does not grow with the size
+of the corpus.
+"""
+import io
+import logging
+import os
+import zipfile
+from itertools import chain
+from typing import Iterator
+
+from models.document import Document
+from models.document_chunk import DocumentChunk
+from schemas.document import Document as DocumentSchema
+from schemas.document_chunk import DocumentChunk as DocumentChunkSchema
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Rows fetched from the database at a time
+EXPORT_BATCH_SIZE = 200
+
+# Bytes collected before a block of the response is sent
+FLUSH_SIZE = 64 * 1024
+
+# Bytes of an original file read at a time
+FILE_BLOCK_SIZE = 1024 * 1024
+
+
+def _line(kind: str, schema, row) -> bytes:
+    return b'{"type":"' + kind.encode() + b'","data":' + schema.model_validate(row).model_dump_json().encode() + b"}\n"
+
+
+def iter_ndjson(db, user_id: int, include_chunks: bool = True) -> Iterator[bytes]:
+    """
+    Yield the NDJSON export of a user's documents, in blocks of about FLUSH_SIZE bytes
+
+    Args:
+        db: SQLAlchemy session
+        user_id (int): Owner of the documents
+        include_chunks (bool): Also export each document's chunks
+
+    Returns:
+        Iterator[bytes]: NDJSON blocks
+    """
+    documents = (
+        Document.query_active(db)
+        .filter(Document.user_id == user_id)
+        .order_by(Document.id)
+        .yield_per(EXPORT_BATCH_SIZE)
+    )
+    block = []
+    size = 0
+    for document in documents:
+        lines = [_line("document", DocumentSchema, document)]
+        if include_chunks:
+            chunks = DocumentChunk.query_by_page_range(db, document.id).yield_per(EXPORT_BATCH_SIZE)
+            lines = chain(lines, (_line("chunk", DocumentChunkSchema, chunk) for chunk in chunks))
+        for line in lines:
+            block.append(line)
+            size += len(line)
+            if size >= FLUSH_SIZE:
+                yield b"".join(block)
+                block = []
+                size = 0
+    if block:
+        yield b"".join(block)
+
+
+class _StreamSink(io.RawIOBase):
+    """
+    Write-only, unseekable file that collects the bytes zipfile writes until drained
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._blocks = []
+        self._pending = 0
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._blocks.append(bytes(data))
+        self._pending += len(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def pending(self) -> int:
+        return self._pending
+
+    def drain(self) -> bytes:
+        data = b"".join(self._blocks)
+        self._blocks = []
+        self._pending = 0
+        return data
+
+
+def iter_zip(db, user_id: int, include_chunks: bool = True) -> Iterator[bytes]:
+    """
+    Yield a zip archive with the NDJSON export and the original files of a user's documents
+
+    Files that are missing from storage are skipped.
+
+    Args:
+        db: SQLAlchemy session
+        user_id (int): Owner of the documents
+        include_chunks (bool): Also export each document's chunks
+
+    Returns:
+        Iterator[bytes]: Blocks of the zip archive
+    """
+    sink = _StreamSink()
+    # The sink can't seek, so zipfile writes sizes and CRCs after each entry
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        with archive.open("documents.ndjson", "w", force_zip64=True) as entry:
+            for block in iter_ndjson(db, user_id, include_chunks):
+                entry.write(block)
+                if sink.pending() >= FLUSH_SIZE:
+                    yield sink.drain()
+
+        files = (
+            Document.query_active(db, Document.id, Document.file_path, Document.created_at)
+            .filter(Document.user_id == user_id)
+            .order_by(Document.id)
+            .yield_per(EXPORT_BATCH_SIZE)
+        )
+        for document_id, file_path, created_at in files:
+            if not os.path.isfile(file_path):
+                logger.warning(f"Export skipped missing file of document {document_id}: {file_path}")
+                continue
+            info = zipfile.ZipInfo(
+                f"files/{document_id}/{os.path.basename(file_path)}",
+                date_time=created_at.timetuple()[:6] if created_at else (1980, 1, 1, 0, 0, 0)
+            )
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with open(file_path, "rb") as f, archive.open(info, "w", force_zip64=True) as entry:
+                while True:
+                    data = f.read(FILE_BLOCK_SIZE)
+                    if not data:
+                        break
+                    entry.write(data)
+                    if sink.pending() >= FLUSH_SIZE:
+                        yield sink.drain()
+    # The rest of the last entry and the central directory
+    yield sink.drain()
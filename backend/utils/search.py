@@ -0,0 +1,386 @@
+"""Chunk retrieval and context packing for search and question answering
+
+Searchers are registered by name and selected with SEARCH_BACKEND:
+    keyword    BM25 ranking of chunks that contain the query terms
+    embedding  cosine similarity between the query and cached chunk embeddings,
+               read from per-user memory-mapped shards (utils.shards) when
+               SEARCH_SHARDS_ENABLED is set
+    postgres   Postgres full-text search (ts_rank_cd ranking, ts_headline
+               snippets) on the generated content_tsv column and its GIN index
+
+Searchers that only query the database and score in Python are plain
+functions, which search_chunks runs in the threadpool; searchers that await
+an embedder are coroutines and move their blocking steps to the threadpool.
+
+Retrieved chunks are packed into a token-budgeted context for the model by
+pack_context: the best chunks are taken until the budget is used up, exact
+duplicates are dropped, and neighbouring chunks of the same document are
+merged with their overlapping text removed.
+"""
+import asyncio
+import logging
+import math
+import re
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Sequence
+from uuid import UUID
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import Float, Integer, String, Text, Uuid, bindparam, or_, text
+
+from core.config import settings
+from models.document_chunk import DocumentChunk
+from utils.document_processor import estimate_tokens
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+SEARCHERS: Dict[str, object] = {}
+
+# Maximum number of candidate chunks scored per keyword query
+MAX_CANDIDATES = 5000
+
+# Longest overlap looked for between neighbouring chunks when merging them
+MAX_OVERLAP_CHARS = 2000
+
+# Shortest repeated text treated as overlap; shorter matches are usually chance
+MIN_OVERLAP_CHARS = 20
+
+_WORD = re.compile(r"\w+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by did do does for from how in is it its of on or that the this to was were what "
+    "when where which who why will with".split()
+)
+
+
+class SearchHit(NamedTuple):
+    """A retrieved chunk and its relevance score"""
+    chunk_id: UUID
+    document_id: int
+    page_number: Optional[int]
+    chunk_index: int
+    section: Optional[str]
+    text: str
+    score: float
+    snippet: Optional[str] = None  # HTML-escaped excerpt with <mark> highlights, for backends that produce one
+
+
+class Citation(NamedTuple):
+    """A numbered source in a packed context"""
+    ref: int
+    chunk_id: UUID
+    document_id: int
+    page_number: Optional[int]
+    section: Optional[str]
+    score: float
+
+
+class PackedContext(NamedTuple):
+    """Context text for the model, the sources it cites and its estimated size"""
+    text: str
+    citations: List[Citation]
+    tokens: int
+
+
+def register_searcher(name: str):
+    """
+    Decorator that registers a search function under a SEARCH_BACKEND name
+    """
+    def decorator(func):
+        SEARCHERS[name] = func
+        return func
+    return decorator
+
+
+def query_terms(query: str) -> List[str]:
+    """
+    Lowercased query words without stopwords, in order of first appearance
+    """
+    terms = []
+    for word in _WORD.findall(query.lower()):
+        if word not in _STOPWORDS and len(word) > 1 and word not in terms:
+            terms.append(word)
+    return terms
+
+
+def _hit(chunk, score: float) -> SearchHit:
+    return SearchHit(chunk.chunk_id, chunk.document_id, chunk.page_number, chunk.chunk_index,
+                     chunk.section, chunk.content, score)
+
+
+@register_searcher("keyword")
+def keyword_search(db, document_ids: Sequence[int], query: str, top_k: int) -> List[SearchHit]:
+    """
+    Rank chunks containing any query term with BM25 (k1=1.2, b=0.75)
+
+    Term statistics come from the candidate chunks, so scores are comparable
+    within one query but not across queries. When more than MAX_CANDIDATES
+    chunks match, the first ones in reading order are scored, so results are
+    reproducible.
+    """
+    terms = query_terms(query)
+    if not terms or not document_ids:
+        return []
+
+    candidates = (
+        db.query(DocumentChunk)
+        .filter(DocumentChunk.document_id.in_(document_ids))
+        .filter(or_(*(DocumentChunk.content.ilike(f"%{term}%") for term in terms)))
+        .order_by(DocumentChunk.document_id, DocumentChunk.page_number, DocumentChunk.chunk_index, DocumentChunk.id)
+        .limit(MAX_CANDIDATES)
+        .all()
+    )
+    if not candidates:
+        return []
+
+    counts = [Counter(_WORD.findall(chunk.content.lower())) for chunk in candidates]
+    lengths = [sum(count.values()) for count in counts]
+    average_length = sum(lengths) / len(lengths) or 1
+    document_frequency = {term: sum(1 for count in counts if term in count) for term in terms}
+
+    scored = []
+    for chunk, count, length in zip(candidates, counts, lengths):
+        score = 0.0
+        for term in terms:
+            frequency = count.get(term, 0)
+            if not frequency:
+                continue
+            df = document_frequency[term]
+            idf = math.log(1 + (len(candidates) - df + 0.5) / (df + 0.5))
+            score += idf * frequency * 2.2 / (frequency + 1.2 * (0.25 + 0.75 * length / average_length))
+        if score > 0:
+            scored.append((score, chunk))
+
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return [_hit(chunk, score) for score, chunk in scored[:top_k]]
+
+
+@register_searcher("embedding")
+async def embedding_search(db, document_ids: Sequence[int], query: str, top_k: int) -> List[SearchHit]:
+    """
+    Rank chunks by cosine similarity between the query and their cached embeddings
+
+    Only chunks that were embedded (have a vector_id) are considered.
+    """
+    from utils.embeddings import get_embedder, get_vectors, normalize_text
+
+    if not document_ids:
+        return []
+    if settings.SEARCH_SHARDS_ENABLED:
+        return await sharded_embedding_search(db, document_ids, query, top_k)
+
+    chunks = await run_in_threadpool(
+        lambda: db.query(DocumentChunk)
+        .filter(DocumentChunk.document_id.in_(document_ids), DocumentChunk.vector_id.isnot(None))
+        .all()
+    )
+    if not chunks:
+        return []
+
+    query_vector = (await get_embedder().embed([normalize_text(query)]))[0]
+
+    def score_chunks() -> List[SearchHit]:
+        query_norm = math.sqrt(sum(value * value for value in query_vector)) or 1.0
+        vectors = get_vectors(db, {chunk.vector_id for chunk in chunks})
+
+        # Identical chunk texts share a vector, so score each vector once
+        similarities = {}
+        for vector_id, vector in vectors.items():
+            norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+            similarities[vector_id] = sum(q * v for q, v in zip(query_vector, vector)) / (query_norm * norm)
+
+        scored = sorted(
+            ((similarities[chunk.vector_id], chunk) for chunk in chunks if chunk.vector_id in similarities),
+            key=lambda item: item[0],
+            reverse=True
+        )
+        return [_hit(chunk, score) for score, chunk in scored[:top_k]]
+
+    return await run_in_threadpool(score_chunks)
+
+
+async def sharded_embedding_search(db, document_ids: Sequence[int], query: str, top_k: int) -> List[SearchHit]:
+    """
+    Rank chunks by cosine similarity using the owners' search shards
+
+    Only the top_k chunk rows are loaded from the database. Mapping or
+    building a shard and scanning it block, so they run in the threadpool.
+    """
+    from models.document import Document
+    from utils.embeddings import get_embedder, normalize_text
+    from utils.shards import shard_index
+
+    owners: Dict[int, List[int]] = {}
+    for document_id, user_id in db.query(Document.id, Document.user_id).filter(Document.id.in_(document_ids)):
+        owners.setdefault(user_id, []).append(document_id)
+    if not owners:
+        return []
+
+    embedder = get_embedder()
+    query_vector = (await embedder.embed([normalize_text(query)]))[0]
+    scored = []
+    for user_id, owned in owners.items():
+        shard = await run_in_threadpool(shard_index.get, user_id, embedder.model)
+        scored.extend(await run_in_threadpool(shard.search, query_vector, owned, top_k))
+    scored = sorted(scored, reverse=True)[:top_k]
+    if not scored:
+        return []
+
+    # Filtering on document_id as well lets Postgres prune chunk partitions
+    chunks = {
+        chunk.id: chunk
+        for chunk in db.query(DocumentChunk).filter(
+            DocumentChunk.document_id.in_(document_ids), DocumentChunk.id.in_([row_id for _, row_id in scored])
+        )
+    }
+    return [_hit(chunks[row_id], score) for score, row_id in scored if row_id in chunks]
+
+
+# The content_tsv column is created by a migration and not mapped on
+# DocumentChunk, so the query is written in SQL. ts_headline is the expensive
+# part and only runs on the top_k rows. The content is HTML-escaped before it
+# goes into ts_headline, so the only markup in a snippet is its <mark> tags.
+FULLTEXT_QUERY = text("""
+    SELECT ranked.*, ts_headline(
+        'english',
+        replace(replace(replace(replace(ranked.content, '&', '&amp;'), '<', '&lt;'), '>', '&gt;'), '"', '&quot;'),
+        websearch_to_tsquery('english', :query),
+        'StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MinWords=8, MaxWords=30'
+    ) AS snippet
+    FROM (
+        SELECT chunk_id, document_id, page_number, chunk_index, section, content,
+               ts_rank_cd(content_tsv, websearch_to_tsquery('english', :query), 32) AS score
+        FROM document_chunks
+        WHERE document_id IN :document_ids
+          AND content_tsv @@ websearch_to_tsquery('english', :query)
+        ORDER BY score DESC
+        LIMIT :top_k
+    ) AS ranked
+    ORDER BY ranked.score DESC
+""").bindparams(
+    bindparam("document_ids", expanding=True),
+    bindparam("top_k", type_=Integer),
+).columns(
+    chunk_id=Uuid, document_id=Integer, page_number=Integer, chunk_index=Integer,
+    section=String, content=Text, score=Float, snippet=Text,
+)
+
+
+@register_searcher("postgres")
+def postgres_search(db, document_ids: Sequence[int], query: str, top_k: int) -> List[SearchHit]:
+    """
+    Rank chunks with Postgres full-text search
+
+    The query is parsed with websearch_to_tsquery, so quoted phrases, OR and
+    -term work as in web search engines. Scores are ts_rank_cd normalized to [0, 1).
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        raise ValueError("The postgres search backend requires a PostgreSQL database")
+    if not document_ids or not query.strip():
+        return []
+
+    rows = db.execute(FULLTEXT_QUERY, {"query": query, "document_ids": list(document_ids), "top_k": top_k})
+    return [
+        SearchHit(row.chunk_id, row.document_id, row.page_number, row.chunk_index, row.section,
+                  row.content, float(row.score), row.snippet)
+        for row in rows
+    ]
+
+
+async def search_chunks(db, document_ids: Sequence[int], query: str, top_k: int = 10,
+                        backend: Optional[str] = None) -> List[SearchHit]:
+    """
+    Retrieve the chunks of the given documents that best match a query
+
+    Args:
+        db: SQLAlchemy session
+        document_ids (Sequence[int]): Documents to search (ownership must already be checked)
+        query (str): Search query or question
+        top_k (int): Maximum number of chunks to return
+        backend (Optional[str]): Searcher name (defaults to SEARCH_BACKEND)
+
+    Returns:
+        List[SearchHit]: Best matching chunks, best first
+    """
+    backend = backend or settings.SEARCH_BACKEND
+    try:
+        searcher = SEARCHERS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown search backend: {backend}")
+    if asyncio.iscoroutinefunction(searcher):
+        return await searcher(db, document_ids, query, top_k)
+    return await run_in_threadpool(searcher, db, document_ids, query, top_k)
+
+
+def strip_overlap(previous: str, text: str, max_overlap: int = MAX_OVERLAP_CHARS,
+                  min_overlap: int = MIN_OVERLAP_CHARS) -> str:
+    """
+    Remove the start of `text` that repeats the end of `previous`
+
+    Chunks overlap their neighbours by design; without this the shared text
+    would be sent to the model twice. Only a repeat of at least `min_overlap`
+    characters that ends at a word boundary in `text` is removed, so a chance
+    match (e.g. "veryone" at the start of "everyone") is kept. The semantic
+    chunker's overlap is whole sentences and can be shorter than its token
+    budget, so a short real overlap may be kept too, which only repeats text.
+    """
+    tail = previous[-max_overlap:]
+    for start in range(len(tail) - min_overlap + 1):
+        overlap = len(tail) - start
+        if text.startswith(tail[start:]) and not (
+            overlap < len(text) and text[overlap - 1].isalnum() and text[overlap].isalnum()
+        ):
+            return text[overlap:]
+    return text
+
+
+def pack_context(hits: Sequence[SearchHit], max_tokens: int) -> PackedContext:
+    """
+    Pack the best hits into a context of at most `max_tokens` (estimated) tokens
+
+    Hits are taken best first and skipped if their text was already taken or
+    if they no longer fit. The selection is then laid out per document in
+    reading order; a chunk directly following another selected chunk is
+    merged into it with the overlapping text removed. Each block is prefixed
+    with a [n] citation marker.
+
+    Args:
+        hits (Sequence[SearchHit]): Retrieved chunks, best first
+        max_tokens (int): Token budget for the context
+
+    Returns:
+        PackedContext: Context text, citations (one per selected chunk) and estimated tokens
+    """
+    selected = []
+    seen_texts = set()
+    used_tokens = 0
+    for hit in hits:
+        key = hit.text.strip()
+        if key in seen_texts:
+            continue
+        tokens = estimate_tokens(hit.text)
+        if used_tokens + tokens > max_tokens:
+            continue
+        seen_texts.add(key)
+        selected.append(hit)
+        used_tokens += tokens
+
+    # Number citations by relevance, lay the text out in reading order
+    refs = {hit.chunk_id: ref for ref, hit in enumerate(selected, start=1)}
+    blocks = []
+    previous = None
+    for hit in sorted(selected, key=lambda h: (h.document_id, h.chunk_index)):
+        adjacent = previous is not None and previous.document_id == hit.document_id \
+            and previous.chunk_index + 1 == hit.chunk_index
+        if adjacent:
+            blocks[-1] += f" [{refs[hit.chunk_id]}] " + strip_overlap(previous.text, hit.text).strip()
+        else:
+            blocks.append(f"[{refs[hit.chunk_id]}] " + hit.text.strip())
+        previous = hit
+
+    text = "\n\n".join(blocks)
+    citations = [
+        Citation(refs[hit.chunk_id], hit.chunk_id, hit.document_id, hit.page_number, hit.section, hit.score)
+        for hit in selected
+    ]
+    return PackedContext(text, citations, estimate_tokens(text))
@@ -0,0 +1,351 @@
+"""Per-user embedding search shards on local disk
+
+Embedding search used to load every candidate chunk and its vector from the
+database on each query. Instead, each user's embedded chunks are written once
+to a shard file (`<SEARCH_SHARD_DIR>/<user_id>.shard`) and memory-mapped on
+first use, so only the pages a query touches are read and the OS page cache is
+shared by all workers on the host. Each worker keeps its mapped shards in an
+LRU and unmaps the coldest ones once they exceed SEARCH_SHARD_MEMORY_MB.
+
+Shard file layout (native byte order):
+    b"WSX1" | header length (>I) | JSON header | padding to 8 bytes
+    chunk row IDs (int64, grouped by document)
+    unit-length vectors (float32, `dimensions` per row)
+
+Invalidation works across processes through a generation file per user
+(`<user_id>.gen`): invalidate_user() bumps its mtime after chunks are added or
+documents deleted, and a shard built for an older generation is rebuilt on its
+next use. The generation is read before the chunks are queried, so a shard
+built while an upload commits is rebuilt again on the next query. Shards are
+always built from the primary: a lagging replica could miss the newest chunks
+under a generation that is already current, and they would never be rebuilt.
+"""
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from heapq import nlargest
+from operator import mul
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from core.config import settings
+from core.metrics import SEARCH_SHARD_EVENTS
+from models.base import SessionLocal
+from models.document import Document
+from models.document_chunk import DocumentChunk
+from models.embedding import EmbeddingCache
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+MAGIC = b"WSX1"
+SHARD_SUFFIX = ".shard"
+GENERATION_SUFFIX = ".gen"
+_HEADER_LENGTH = struct.Struct(">I")
+
+# Number of cached vectors fetched from the database at a time while building
+VECTOR_BATCH_SIZE = 500
+
+
+class Shard:
+    """
+    A memory-mapped shard: chunk row IDs and unit-length vectors of one user's
+    embedded chunks, with the row range of each document
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"Not a search shard: {path}")
+        (header_length,) = _HEADER_LENGTH.unpack_from(self._mmap, len(MAGIC))
+        header_start = len(MAGIC) + _HEADER_LENGTH.size
+        header = json.loads(self._mmap[header_start:header_start + header_length])
+
+        self.generation: int = header["generation"]
+        self.model: str = header["model"]
+        self.dimensions: int = header["dimensions"]
+        self.count: int = header["count"]
+        self.documents: Dict[int, Tuple[int, int]] = {
+            int(document_id): tuple(rows) for document_id, rows in header["documents"].items()
+        }
+        self.nbytes = len(self._mmap)
+
+        ids_start = _align(header_start + header_length)
+        vectors_start = ids_start + 8 * self.count
+        view = memoryview(self._mmap)
+        self.ids = view[ids_start:vectors_start].cast("q")
+        self.vectors = view[vectors_start:vectors_start + 4 * self.count * self.dimensions].cast("f")
+
+    def search(self, query_vector: Sequence[float], document_ids: Sequence[int], top_k: int) -> List[Tuple[float, int]]:
+        """
+        Get the (cosine similarity, chunk row ID) pairs of the best chunks of the given documents
+        """
+        norm = math.sqrt(sum(value * value for value in query_vector)) or 1.0
+        query = [value / norm for value in query_vector]
+        dimensions = self.dimensions
+        vectors = self.vectors
+
+        def scored():
+            for document_id in document_ids:
+                rows = self.documents.get(document_id)
+                if rows is None:
+                    continue
+                start, end = rows
+                for row in range(start, end):
+                    offset = row * dimensions
+                    yield sum(map(mul, query, vectors[offset:offset + dimensions])), self.ids[row]
+
+        return nlargest(top_k, scored())
+
+
+def _align(offset: int, boundary: int = 8) -> int:
+    return (offset + boundary - 1) // boundary * boundary
+
+
+def write_shard(path: str, generation: int, model: str, dimensions: int,
+                documents: Dict[int, Tuple[int, int]], ids: array, vectors: array) -> int:
+    """
+    Write a shard file atomically, returning its size in bytes
+    """
+    header = json.dumps({
+        "generation": generation,
+        "model": model,
+        "dimensions": dimensions,
+        "count": len(ids),
+        "documents": {str(document_id): list(rows) for document_id, rows in documents.items()},
+    }, separators=(",", ":")).encode("utf-8")
+    header_end = len(MAGIC) + _HEADER_LENGTH.size + len(header)
+
+    # Write to a temporary file and rename, so readers never map a partial shard
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(_HEADER_LENGTH.pack(len(header)))
+        f.write(header)
+        f.write(b"\0" * (_align(header_end) - header_end))
+        ids.tofile(f)
+        vectors.tofile(f)
+        size = f.tell()
+    os.replace(tmp_path, path)
+    return size
+
+
+def build_shard(db, path: str, user_id: int, generation: int, model: str) -> int:
+    """
+    Write the shard of a user's embedded chunks from the database
+
+    Args:
+        db: SQLAlchemy session
+        path (str): Shard file to write
+        user_id (int): Owner of the chunks
+        generation (int): Generation the shard is built for
+        model (str): Embedding model of the query vectors
+
+    Returns:
+        int: Number of chunks in the shard
+    """
+    rows = (
+        db.query(DocumentChunk.id, DocumentChunk.document_id, DocumentChunk.vector_id)
+        .join(Document, Document.id == DocumentChunk.document_id)
+        .filter(Document.user_id == user_id, Document.deleted_at.is_(None), DocumentChunk.vector_id.isnot(None))
+        .order_by(DocumentChunk.document_id, DocumentChunk.id)
+        .yield_per(VECTOR_BATCH_SIZE)
+    )
+
+    dimensions = settings.EMBEDDING_DIMENSIONS
+    documents: Dict[int, Tuple[int, int]] = {}
+    ids = array("q")
+    vectors = array("f")
+
+    def add(batch):
+        nonlocal dimensions
+        found = EmbeddingCache.get_many(db, {vector_id for _, _, vector_id in batch})
+        for chunk_row_id, document_id, vector_id in batch:
+            data = found.get(vector_id)
+            if data is None:
+                continue
+            vector = array("f")
+            vector.frombytes(data)
+            if not ids:
+                dimensions = len(vector)
+            elif len(vector) != dimensions:
+                continue
+            norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+            start, _ = documents.get(document_id, (len(ids), 0))
+            ids.append(chunk_row_id)
+            vectors.extend(value / norm for value in vector)
+            documents[document_id] = (start, len(ids))
+
+    batch = []
+    for row in rows:
+        batch.append(tuple(row))
+        if len(batch) == VECTOR_BATCH_SIZE:
+            add(batch)
+            batch = []
+    if batch:
+        add(batch)
+
+    write_shard(path, generation, model, dimensions, documents, ids, vectors)
+    return len(ids)
+
+
+class ShardIndex:
+    """
+    Lazily loaded per-user shards with LRU eviction under a memory budget
+
+    Usage:
+        shard = shard_index.get(user_id, model)
+        for score, chunk_row_id in shard.search(query_vector, document_ids, top_k): ...
+        shard_index.invalidate(user_id)  # after the user's chunks change
+    """
+
+    def __init__(self, directory: str, memory_budget: int):
+        self.directory = directory
+        self.memory_budget = memory_budget
+        self._shards: "OrderedDict[int, Shard]" = OrderedDict()
+        self._mapped_bytes = 0
+        self._lock = threading.Lock()
+        self._build_locks: Dict[int, threading.Lock] = {}
+
+    def shard_path(self, user_id: int) -> str:
+        return os.path.join(self.directory, f"{user_id}{SHARD_SUFFIX}")
+
+    def generation_path(self, user_id: int) -> str:
+        return os.path.join(self.directory, f"{user_id}{GENERATION_SUFFIX}")
+
+    def generation(self, user_id: int) -> int:
+        """
+        Current generation of a user's chunks (0 if never invalidated)
+        """
+        try:
+            return os.stat(self.generation_path(user_id)).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def invalidate(self, user_id: int) -> None:
+        """
+        Mark a user's shard as stale in every process on this host
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.generation_path(user_id)
+        previous = self.generation(user_id)
+        with open(path, "a"):
+            pass
+        # Make sure the generation changes even within the filesystem's timestamp resolution
+        stamp = max(time.time_ns(), previous + 1000)
+        os.utime(path, ns=(stamp, stamp))
+        self._discard(user_id)
+
+    def get(self, user_id: int, model: str) -> Shard:
+        """
+        Get a user's shard, mapping it from disk or building it from the primary if it is missing or stale
+        """
+        generation = self.generation(user_id)
+        shard = self._cached(user_id, generation, model)
+        if shard is not None:
+            SEARCH_SHARD_EVENTS.labels("hit").inc()
+            return shard
+
+        # One build per user at a time in this process; other requests wait for it
+        with self._lock:
+            build_lock = self._build_locks.setdefault(user_id, threading.Lock())
+        with build_lock:
+            shard = self._cached(user_id, generation, model)
+            if shard is not None:
+                SEARCH_SHARD_EVENTS.labels("hit").inc()
+                return shard
+
+            path = self.shard_path(user_id)
+            shard = self._open(path, generation, model)
+            if shard is not None:
+                SEARCH_SHARD_EVENTS.labels("load").inc()
+            else:
+                os.makedirs(self.directory, exist_ok=True)
+                started = time.perf_counter()
+                with SessionLocal() as db:
+                    count = build_shard(db, path, user_id, generation, model)
+                logger.info(f"Built search shard for user {user_id} ({count} chunks) "
+                            f"in {time.perf_counter() - started:.2f}s")
+                SEARCH_SHARD_EVENTS.labels("build").inc()
+                shard = Shard(path)
+            self._add(user_id, shard)
+            return shard
+
+    def _cached(self, user_id: int, generation: int, model: str) -> Optional[Shard]:
+        with self._lock:
+            shard = self._shards.get(user_id)
+            if shard is None:
+                return None
+            if shard.generation != generation or shard.model != model:
+                self._remove(user_id)
+                return None
+            self._shards.move_to_end(user_id)
+            return shard
+
+    @staticmethod
+    def _open(path: str, generation: int, model: str) -> Optional[Shard]:
+        """
+        Map a shard written by any process, if it is current
+        """
+        try:
+            shard = Shard(path)
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable search shard {path}: {str(e)}")
+            return None
+        if shard.generation != generation or shard.model != model:
+            return None
+        return shard
+
+    def _add(self, user_id: int, shard: Shard) -> None:
+        with self._lock:
+            self._remove(user_id)
+            self._shards[user_id] = shard
+            self._mapped_bytes += shard.nbytes
+            # Keep at least the shard just added, even if it alone exceeds the budget
+            while self._mapped_bytes > self.memory_budget and len(self._shards) > 1:
+                evicted, _ = next(iter(self._shards.items()))
+                self._remove(evicted)
+                SEARCH_SHARD_EVENTS.labels("evict").inc()
+
+    def _discard(self, user_id: int) -> None:
+        with self._lock:
+            self._remove(user_id)
+
+    def _remove(self, user_id: int) -> None:
+        # Searches still holding the shard keep the mapping alive; it is
+        # unmapped once the last reference is gone
+        shard = self._shards.pop(user_id, None)
+        if shard is not None:
+            self._mapped_bytes -= shard.nbytes
+
+    @property
+    def mapped_bytes(self) -> int:
+        return self._mapped_bytes
+
+    def __len__(self) -> int:
+        return len(self._shards)
+
+
+shard_index = ShardIndex(settings.SEARCH_SHARD_DIR, settings.SEARCH_SHARD_MEMORY_MB * 1024 * 1024)
+
+
+def invalidate_user(user_id: int) -> None:
+    """
+    Mark a user's search shard as stale after chunks were added, replaced or deleted
+    """
+    # No shards were ever built on this host, so there is nothing to invalidate
+    if not os.path.isdir(shard_index.directory):
+        return
+    try:
+        shard_index.invalidate(user_id)
+    except OSError as e:
+        logger.error(f"Error invalidating search shard for user {user_id}: {str(e)}")
@@ -0,0 +1,144 @@
+"""Persisted per-page text cache for uploaded documents
+
+Extracted page text is stored once per document in a sidecar file next to the
+upload (`<file_path>.pages`), so summarization, re-chunking and indexing don't
+have to parse the original PDF again. Each page is compressed separately and
+the file starts with an offset table, which lets callers read a page range
+without decompressing the rest of the document.
+
+File layout:
+    MAGIC (4 bytes) | header length (4 bytes, big endian) | JSON header | page data
+"""
+import json
+import logging
+import os
+import struct
+import zlib
+from typing import Iterator, List, Optional
+
+from utils.document_processor import TextSegment, extract_pages
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+MAGIC = b"WSP1"
+CACHE_SUFFIX = ".pages"
+_HEADER_LENGTH = struct.Struct(">I")
+
+
+def cache_path(file_path: str) -> str:
+    """
+    Get the path of the text cache sidecar for an uploaded file
+    """
+    return file_path + CACHE_SUFFIX
+
+
+def write_page_cache(file_path: str, pages: List[TextSegment], level: int = 6) -> str:
+    """
+    Compress and store extracted page text next to an uploaded file
+
+    Args:
+        file_path (str): Path of the uploaded file
+        pages (List[TextSegment]): Segments as returned by extract_pages
+        level (int): zlib compression level
+
+    Returns:
+        str: Path of the written cache file
+    """
+    entries = []
+    blobs = []
+    offset = 0
+    for page_num, page_text, section in pages:
+        blob = zlib.compress(page_text.encode("utf-8"), level)
+        entry = {"page": page_num, "offset": offset, "length": len(blob)}
+        if section is not None:
+            entry["section"] = section
+        entries.append(entry)
+        blobs.append(blob)
+        offset += len(blob)
+
+    header = json.dumps({"entries": entries}, separators=(",", ":")).encode("utf-8")
+
+    # Write to a temporary file and rename, so readers never see a partial cache
+    path = cache_path(file_path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(_HEADER_LENGTH.pack(len(header)))
+        f.write(header)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp_path, path)
+
+    return path
+
+
+def load_pages(file_path: str, first_page: Optional[int] = None,
+               last_page: Optional[int] = None) -> Iterator[TextSegment]:
+    """
+    Lazily read cached page text for an uploaded file
+
+    Only the segments within pages [first_page, last_page] are read and decompressed.
+
+    Args:
+        file_path (str): Path of the uploaded file
+        first_page (Optional[int]): First page to return (inclusive)
+        last_page (Optional[int]): Last page to return (inclusive)
+
+    Returns:
+        Iterator[TextSegment]: Cached segments in page order
+
+    Raises:
+        FileNotFoundError: If no cache exists for the file
+        ValueError: If the cache file is not in the expected format
+    """
+    with open(cache_path(file_path), "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Invalid page cache for {file_path}")
+        (header_length,) = _HEADER_LENGTH.unpack(f.read(_HEADER_LENGTH.size))
+        header = json.loads(f.read(header_length))
+        data_start = len(MAGIC) + _HEADER_LENGTH.size + header_length
+
+        for entry in header["entries"]:
+            page_num = entry["page"]
+            if first_page is not None and page_num < first_page:
+                continue
+            if last_page is not None and page_num > last_page:
+                break
+            f.seek(data_start + entry["offset"])
+            text = zlib.decompress(f.read(entry["length"])).decode("utf-8")
+            yield TextSegment(page_num, text, entry.get("section"))
+
+
+def get_document_pages(file_path: str, file_type: str, first_page: Optional[int] = None,
+                       last_page: Optional[int] = None, refresh: bool = False) -> List[TextSegment]:
+    """
+    Get page text for an uploaded file, extracting and caching it on a miss
+
+    Args:
+        file_path (str): Path of the uploaded file
+        file_type (str): Type of the file (pdf, txt, etc.)
+        first_page (Optional[int]): First page to return (inclusive)
+        last_page (Optional[int]): Last page to return (inclusive)
+        refresh (bool): Ignore any existing cache and extract the file again
+
+    Returns:
+        List[TextSegment]: Segments in page order
+    """
+    if not refresh:
+        try:
+            return list(load_pages(file_path, first_page, last_page))
+        except FileNotFoundError:
+            pass
+        except ValueError as e:
+            logger.warning(str(e))
+
+    with open(file_path, "rb") as f:
+        pages = extract_pages(f.read(), file_type)
+    write_page_cache(file_path, pages)
+
+    return [
+        segment for segment in pages
+        if (first_page is None or segment.page_number >= first_page)
+        and (last_page is None or segment.page_number <= last_page)
+    ]